@@ -0,0 +1,390 @@
+import math
+import time
+import logging
+import threading
+import cv2 as cv
+import numpy as np
+from collections import deque
+from Command import Command
+from CommandFilter import CommandFilter
+from Telemetry import Telemetry
+
+logger = logging.getLogger(__name__)
+
+
+# 容量有限的“最新帧优先”队列：队满时丢弃最旧的元素，消费者拿到的总是最新数据，不会积压
+# on_drop(item) 在元素被丢弃时调用，用于归还其占用的资源
+class LatestQueue:
+    def __init__(self, maxsize=1, on_drop=None):
+        self.__items = deque(maxlen=maxsize)
+        self.__condition = threading.Condition()
+        self.__closed = False
+        self.on_drop = on_drop
+        self.dropped = 0  # 因过期被丢弃的元素数量
+
+    def put(self, item):
+        dropped = None
+        with self.__condition:
+            if len(self.__items) == self.__items.maxlen:
+                self.dropped += 1
+                dropped = self.__items[0]
+            self.__items.append(item)
+            self.__condition.notify()
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+
+    # 超时或队列关闭时返回 None，用 finished 区分两者
+    def get(self, timeout=None):
+        with self.__condition:
+            if not self.__items and not self.__closed:
+                self.__condition.wait(timeout)
+            if not self.__items:
+                return None
+            return self.__items.popleft()
+
+    def close(self):
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+    # 队列已经关闭且取空，之后不会再有新的元素
+    def finished(self):
+        with self.__condition:
+            return self.__closed and not self.__items
+
+
+# 画面缓冲池：采集时把画面翻转写入预先分配的缓冲区，之后推理、绘制、显示都在同一块内存上进行，
+# 不再为每帧分配新数组。缓冲区用完后需要 release 归还；全部被占用时 acquire 返回 None
+class FramePool:
+    def __init__(self, count=8):
+        self.count = count
+        self.exhausted = 0  # 缓冲区不足的次数
+        self.__free = []
+        self.__shape = None
+        self.__lock = threading.Lock()
+
+    def acquire(self, shape, dtype=np.uint8):
+        with self.__lock:
+            if shape != self.__shape:
+                # 画面尺寸变化时重新分配全部缓冲区，旧尺寸的缓冲区归还时直接丢弃
+                self.__shape = shape
+                self.__free = [np.empty(shape, dtype) for _ in range(self.count)]
+            if not self.__free:
+                self.exhausted += 1
+                return None
+            return self.__free.pop()
+
+    def release(self, buffer):
+        with self.__lock:
+            if buffer.shape == self.__shape and len(self.__free) < self.count:
+                self.__free.append(buffer)
+
+
+# 推理调度：根据推理耗时与采集帧间隔估计推理线程的负载，每 interval 帧推理一次，使负载不超过 target_load；
+# 跳过推理的帧由最近推理得到的手势中心外推位置，挥手识别因此不受实际推理帧率影响。
+# extrapolation 为 "linear" 时按最近两次推理结果线性外推，为 "velocity" 时按平滑后的速度匀速外推
+class InferenceScheduler:
+    def __init__(self, target_load=0.7, max_interval=4, extrapolation="linear", max_horizon=0.2, smoothing=0.2):
+        if extrapolation not in ("linear", "velocity"):
+            raise ValueError(extrapolation, "Expected 'linear' or 'velocity'")
+        self.target_load = target_load
+        self.max_interval = max_interval
+        self.extrapolation = extrapolation
+        self.max_horizon = max_horizon  # 最多向前外推的时间（秒），避免长时间跳帧时位置越推越远
+        self.smoothing = smoothing  # 指数滑动平均的系数
+        self.interval = 1
+
+        self.__frame_period = None
+        self.__inference_time = None
+        self.__last_capture = None
+        self.__skipped = 0
+        self.__samples = deque(maxlen=2)  # 最近两次推理得到的 (timestamp, center)
+        self.__velocity = (0.0, 0.0)
+
+    def __smooth(self, average, value):
+        return value if average is None else average + self.smoothing * (value - average)
+
+    # 在采集阶段调用，估计采集帧间隔
+    def observe_capture(self, timestamp):
+        if self.__last_capture is not None and timestamp > self.__last_capture:
+            self.__frame_period = self.__smooth(self.__frame_period, timestamp - self.__last_capture)
+        self.__last_capture = timestamp
+
+    def should_infer(self):
+        if self.__skipped + 1 >= self.interval:
+            self.__skipped = 0
+            return True
+        self.__skipped += 1
+        return False
+
+    # 记录一次推理的耗时与得到的手势中心（没有检测到手时为 None），并调整推理间隔
+    def record(self, timestamp, elapsed, center):
+        self.__inference_time = self.__smooth(self.__inference_time, elapsed)
+        if self.__frame_period:
+            load_interval = math.ceil(self.__inference_time / (self.target_load * self.__frame_period))
+            self.interval = min(self.max_interval, max(1, load_interval))
+
+        if center is None:
+            self.clear_motion()
+            return
+        if self.__samples:
+            previous_time, previous_center = self.__samples[-1]
+            if timestamp > previous_time:
+                vx = (center[0] - previous_center[0]) / (timestamp - previous_time)
+                vy = (center[1] - previous_center[1]) / (timestamp - previous_time)
+                self.__velocity = (self.__smooth(self.__velocity[0], vx), self.__smooth(self.__velocity[1], vy))
+        self.__samples.append((timestamp, center))
+
+    # 清空手势中心的历史，之后的位置与之前的位置不再连续时调用（手部丢失、切换控制的手）
+    def clear_motion(self):
+        self.__samples.clear()
+        self.__velocity = (0.0, 0.0)
+
+    # 预测 timestamp 时刻的手势中心，最近没有检测到手时返回 None
+    def predict(self, timestamp):
+        if not self.__samples:
+            return None
+        last_time, (x, y) = self.__samples[-1]
+        if self.extrapolation == "velocity":
+            vx, vy = self.__velocity
+        elif len(self.__samples) == 2 and last_time > self.__samples[0][0]:
+            first_time, (x0, y0) = self.__samples[0]
+            vx, vy = (x - x0) / (last_time - first_time), (y - y0) / (last_time - first_time)
+        else:
+            vx, vy = 0.0, 0.0
+        horizon = min(max(timestamp - last_time, 0.0), self.max_horizon)
+        return int(x + vx * horizon), int(y + vy * horizon)
+
+
+# 在流水线各阶段之间传递的一帧数据
+class FramePacket:
+    __slots__ = ("frame", "captured_at", "timestamp", "index", "landmark", "command")
+
+    def __init__(self, frame, captured_at, timestamp, index=None, landmark=None):
+        self.frame = frame
+        self.captured_at = captured_at  # time.perf_counter_ns() 采集时间，用于统计各阶段延迟
+        self.timestamp = timestamp  # 画面来源给出的时间，回放时为录制时间，用于手势的时间判断
+        self.index = index  # 录制时的帧序号
+        self.landmark = landmark  # 回放录制的关键点时由画面来源提供，此时跳过推理
+        self.command = Command.NONE
+
+
+# 摄像头画面处理流水线：采集线程 -> 推理线程 -> 渲染线程，阶段之间用最新帧优先队列连接，
+# 推理跟不上时直接丢弃过期画面，而不是让延迟越积越多。
+# 画面来源可以是摄像头（FrameSource.CameraSource）或录制数据（FrameSource.ReplaySource），
+# run_sync 在当前线程中逐帧依次执行三个阶段、不丢帧，用于可复现的回放与基准测试
+# （需要完全可复现时应传入 InferenceScheduler(max_interval=1) 关闭跳帧）
+class CameraPipeline:
+    def __init__(self, source, recognizer, on_command, on_frame, command_filter=None, scheduler=None, recorder=None,
+                 report_interval=5.0, stats=None, draw=True, on_finished=None):
+        self.source = source
+        self.recognizer = recognizer
+        self.command_filter = CommandFilter() if command_filter is None else command_filter
+        self.scheduler = InferenceScheduler() if scheduler is None else scheduler
+        self.recorder = recorder  # FrameSource.SessionRecorder，可选
+        self.on_command = on_command  # on_command(command, captured_at)，在推理线程中调用，captured_at 单位为纳秒
+        # on_frame(frame)，在渲染线程中调用，可以为 None；返回 True 表示接收方继续持有画面缓冲区，用完后需调用 release_frame 归还
+        self.on_frame = on_frame
+        self.report_interval = report_interval
+        self.draw = draw  # 是否在画面上绘制关键点、手势中心和帧率，无界面运行时关闭
+        # on_finished()，画面来源结束（例如回放完毕）且全部画面处理完后在渲染线程中调用，可以为 None；调用 stop 时不会调用
+        self.on_finished = on_finished
+
+        self.stats = Telemetry() if stats is None else stats  # 可以与播放器等共用同一个 Telemetry
+        self.frames = 0
+        self.frame_pool = FramePool()
+        self.__inference_queue = LatestQueue(on_drop=self.__drop)
+        self.__render_queue = LatestQueue(on_drop=self.__drop)
+        self.__stopped = threading.Event()
+        self.__threads = []
+        self.__hand_id = None  # 控制播放器的手的跟踪编号
+
+
+    def start(self):
+        for target in (self.__capture_loop, self.__inference_loop, self.__render_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.__threads.append(thread)
+
+
+    def stop(self, timeout=1.0):
+        self.__stopped.set()
+        self.__inference_queue.close()
+        self.__render_queue.close()
+        for thread in self.__threads:
+            thread.join(timeout)
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        logger.info("流水线已停止，丢帧：推理 %d，渲染 %d，缓冲区不足 %d；%s", self.__inference_queue.dropped,
+                    self.__render_queue.dropped, self.frame_pool.exhausted, self.stats.format())
+
+
+    def release_frame(self, frame):
+        self.frame_pool.release(frame)
+
+
+    def __drop(self, packet):
+        if packet.frame is not None:
+            self.frame_pool.release(packet.frame)
+
+
+    # 在当前线程中处理画面来源的全部画面（或前 limit 帧），返回处理的帧数
+    def run_sync(self, limit=None):
+        processed = 0
+        while limit is None or processed < limit:
+            packet = self.__capture()
+            if packet is None:
+                break
+            self.__infer(packet)
+            self.__render(packet)
+            processed += 1
+        return processed
+
+
+    def __capture(self):
+        start = time.perf_counter_ns()
+        ret, frame = self.source.read()
+        if not ret:
+            return None
+        index = None
+        if self.recorder is not None:
+            index = self.recorder.write_frame(self.source.timestamp, frame)
+        if frame is not None:
+            buffer = self.frame_pool.acquire(frame.shape)
+            # 缓冲区全部被占用时（显示端处理过慢）临时分配一块，不丢弃画面
+            frame = cv.flip(frame, 1) if buffer is None else cv.flip(frame, 1, dst=buffer)
+        captured_at = time.perf_counter_ns()
+        self.stats.record_ns("capture", captured_at - start)
+        self.scheduler.observe_capture(self.source.timestamp)
+        return FramePacket(frame, captured_at, self.source.timestamp, index, self.source.landmark)
+
+
+    def __capture_loop(self):
+        while not self.__stopped.is_set():
+            packet = self.__capture()
+            if packet is None:
+                break
+            self.__inference_queue.put(packet)
+        self.__inference_queue.close()
+
+
+    def __infer(self, packet):
+        start = time.perf_counter_ns()
+        self.stats.record_ns("queue", start - packet.captured_at)
+        self.frames += 1
+
+        if packet.landmark is None and not self.scheduler.should_infer():
+            # 跳过推理：用外推的手势中心继续识别挥手，静态手势沿用上一次推理的结果
+            command = self.recognizer.static_command
+            center = self.scheduler.predict(packet.timestamp)
+            if center is not None:
+                swipe = self.recognizer.track_center(self.__canvas(packet), center, packet.timestamp)
+                command = command if swipe == Command.NONE else swipe
+            self.stats.record_ns("predict", time.perf_counter_ns() - start)
+            self.__dispatch(packet, command)
+            return
+
+        try:
+            if packet.landmark is None:
+                landmark = self.recognizer.get_landmark(packet.frame, self.draw, packet.timestamp)
+            elif len(packet.landmark) == 0:
+                raise RuntimeError()  # 录制时该帧没有检测到手
+            else:
+                landmark = packet.landmark
+            inferred = time.perf_counter_ns()
+            self.stats.record_ns("inference", inferred - start)
+            self.scheduler.record(packet.timestamp, (inferred - start) / 1e9, (int(landmark[9][0]), int(landmark[9][1])))
+            if self.recorder is not None:
+                self.recorder.write_landmark(packet.index, landmark)
+
+            command = self.recognizer.gesture_recognise(self.__canvas(packet), landmark, packet.timestamp)
+            self.stats.record_ns("classify", time.perf_counter_ns() - inferred)
+            self.__check_hand()
+            self.__dispatch(packet, command)
+        except RuntimeError:
+            elapsed = time.perf_counter_ns() - start
+            self.stats.record_ns("inference", elapsed)
+            self.scheduler.record(packet.timestamp, elapsed / 1e9, None)
+            if self.recorder is not None:
+                self.recorder.write_landmark(packet.index, None)
+            self.recognizer.reset_tracking()
+            # 没有检测到手也要计入过滤器，使之前的命令票数逐渐衰减
+            self.command_filter.update(Command.NONE, packet.timestamp)
+        except TypeError as e:
+            print(type(e), e)
+        except ValueError as e:
+            print(type(e), e)
+
+
+    # 控制权切换到另一只手时，上一只手的命令投票和运动外推都不能沿用
+    def __check_hand(self):
+        hand_id = self.recognizer.active_hand_id
+        if hand_id != self.__hand_id:
+            self.__hand_id = hand_id
+            self.command_filter.reset()
+            self.scheduler.clear_motion()
+
+
+    # 需要绘制时返回画面，否则返回 None，识别器不会在画面上绘制
+    def __canvas(self, packet):
+        return packet.frame if self.draw else None
+
+
+    # 经过时间过滤后把命令交给 on_command
+    def __dispatch(self, packet, command):
+        packet.command = command
+        command = self.command_filter.update(command, packet.timestamp)
+        if command != Command.NONE:
+            self.on_command(command, packet.captured_at)
+
+
+    def __inference_loop(self):
+        last_report = time.perf_counter_ns()
+
+        while not self.__stopped.is_set():
+            packet = self.__inference_queue.get(timeout=0.5)
+            if packet is None:
+                if self.__inference_queue.finished():
+                    break
+                continue
+            self.__infer(packet)
+            self.__render_queue.put(packet)
+
+            if packet.captured_at - last_report > self.report_interval * 1e9:
+                last_report = packet.captured_at
+                logger.info("丢帧：推理 %d，渲染 %d；%s",
+                            self.__inference_queue.dropped, self.__render_queue.dropped, self.stats.format())
+        # 画面来源已经结束（或流水线已停止），渲染线程处理完剩余的画面后退出
+        self.__render_queue.close()
+
+
+    def __render(self, packet):
+        self.stats.tick("frame")
+        # 只回放关键点时没有画面
+        if packet.frame is None:
+            return
+        start = time.perf_counter_ns()
+        if self.draw:
+            # 显示按最近帧间隔中位数计算的帧率，避免瞬时帧率的抖动
+            fps = self.stats.fps("frame")
+            if fps is not None:
+                cv.putText(packet.frame, str(int(fps)), (20, 50), cv.FONT_HERSHEY_COMPLEX_SMALL, 2, (0x66, 0xcc, 0xff), thickness=2)
+
+        # 没有 on_frame 时（无界面运行）直接归还画面缓冲区
+        if self.on_frame is None or not self.on_frame(packet.frame):
+            self.frame_pool.release(packet.frame)
+        finished = time.perf_counter_ns()
+        self.stats.record_ns("render", finished - start)
+        self.stats.record_ns("end_to_end", finished - packet.captured_at)
+
+
+    def __render_loop(self):
+        while not self.__stopped.is_set():
+            packet = self.__render_queue.get(timeout=0.5)
+            if packet is not None:
+                self.__render(packet)
+            elif self.__render_queue.finished():
+                if not self.__stopped.is_set() and self.on_finished is not None:
+                    self.on_finished()
+                break
@@ -0,0 +1,22 @@
+from enum import Enum, unique, auto
+
+
+# 手势识别、播放器和界面之间传递的命令，单独放在一个模块中，
+# 只需要命令的模块（播放器、界面、命令过滤器）不会因此导入 mediapipe、OpenCV 等较重的依赖
+@unique
+class Command(Enum):
+    VOLUME_UP = auto()
+    VOLUME_DOWN = auto()
+    TOGGLE = auto()
+    NEXT = auto()
+    PREVIOUS = auto()
+    TOGGLE_FAVORITE = auto()
+    EXIT = auto()
+    SEEK_FORWARD = auto()
+    SEEK_BACKWARD = auto()
+    SHUFFLE = auto()
+    RESTART = auto()
+    REPEAT = auto()
+    PLAY_FAVORITES = auto()
+    CLEAR_QUEUE = auto()
+    NONE = auto()
@@ -0,0 +1,103 @@
+from Command import Command
+
+# 每秒最多触发的次数
+DEFAULT_RATE_LIMITS = {
+    Command.VOLUME_UP: 2.0,
+    Command.VOLUME_DOWN: 2.0,
+    Command.NEXT: 1.0,
+    Command.PREVIOUS: 1.0,
+    Command.TOGGLE: 1.0,
+    Command.TOGGLE_FAVORITE: 1.0,
+    Command.SHUFFLE: 1.0,
+    Command.RESTART: 1.0,
+    Command.SEEK_FORWARD: 4.0,
+    Command.SEEK_BACKWARD: 4.0,
+}
+
+
+# 命令过滤器接口：逐帧输入识别结果，返回本帧实际要执行的命令（无需执行时返回 Command.NONE）
+# 所有过滤器都提供 update(command, timestamp) 和 reset() 两个方法，可以在流水线中互相替换
+
+# 改造前 main.py 中的策略：命令与上一帧不同即触发，音量命令每帧都触发。保留用于对照评估
+class LegacyCommandFilter:
+    def __init__(self):
+        self.previous_command = Command.NONE
+
+    def reset(self):
+        self.previous_command = Command.NONE
+
+    def update(self, command, timestamp):
+        if command != self.previous_command or command in [Command.VOLUME_DOWN, Command.VOLUME_UP]:
+            self.previous_command = command
+            return command
+        return Command.NONE
+
+
+# 时间平滑与防抖：
+# - 最近 window 帧的识别结果保存在固定长度的环形缓冲区中，某个命令得票达到 enter_votes 才会被确认；
+# - 已确认的命令得票降到 release_votes 以下才会释放（滞回），避免在阈值附近来回抖动；
+# - 命令只在被确认的那一帧触发一次，repeatable 中的命令在保持期间按频率限制重复触发；
+# - impulses 中的命令（挥手等动态手势）本身只持续一两帧，不参与投票，直接按频率限制触发
+class CommandFilter:
+    def __init__(self, window=5, enter_votes=3, release_votes=2, rate_limits=None,
+                 repeatable=(Command.VOLUME_UP, Command.VOLUME_DOWN),
+                 impulses=(Command.NEXT, Command.PREVIOUS, Command.SHUFFLE, Command.RESTART,
+                           Command.SEEK_FORWARD, Command.SEEK_BACKWARD)):
+        if not 0 < release_votes <= enter_votes <= window:
+            raise ValueError("需要满足 0 < release_votes <= enter_votes <= window")
+        self.window = window
+        self.enter_votes = enter_votes
+        self.release_votes = release_votes
+        self.rate_limits = DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits
+        self.repeatable = frozenset(repeatable)
+        self.impulses = frozenset(impulses)
+        self.reset()
+
+    def reset(self):
+        self.active = Command.NONE
+        self.__history = [Command.NONE] * self.window
+        self.__index = 0
+        self.__votes = {command: 0 for command in Command}
+        self.__votes[Command.NONE] = self.window
+        self.__last_emitted = {}
+
+    def update(self, command, timestamp):
+        # 环形缓冲区中用新结果覆盖最旧的结果，同时增量更新票数
+        self.__votes[self.__history[self.__index]] -= 1
+        self.__history[self.__index] = command
+        self.__votes[command] += 1
+        self.__index = (self.__index + 1) % self.window
+
+        if command in self.impulses:
+            return self.__emit(command, timestamp)
+
+        previous = self.active
+        if command != self.active and self.__votes[command] >= self.enter_votes:
+            self.active = command
+        elif self.__votes[self.active] < self.release_votes:
+            self.active = Command.NONE
+
+        if self.active == Command.NONE:
+            return Command.NONE
+        if self.active != previous or self.active in self.repeatable:
+            return self.__emit(self.active, timestamp)
+        return Command.NONE
+
+    def __emit(self, command, timestamp):
+        rate = self.rate_limits.get(command)
+        last = self.__last_emitted.get(command)
+        if rate and last is not None and timestamp - last < 1 / rate:
+            return Command.NONE
+        self.__last_emitted[command] = timestamp
+        return command
+
+
+# 离线回放：将逐帧识别结果依次送入过滤器，返回 [(帧序号, 触发的命令)]
+def replay(command_filter, commands, timestamps):
+    command_filter.reset()
+    emitted = []
+    for i, (command, timestamp) in enumerate(zip(commands, timestamps)):
+        command = command_filter.update(command, timestamp)
+        if command != Command.NONE:
+            emitted.append((i, command))
+    return emitted
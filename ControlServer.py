@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from urllib.parse import urlsplit
+from Command import Command
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+
+# 解析监听地址："unix:/路径" 为 Unix socket，否则为 "主机:端口"（只有端口时监听 127.0.0.1），空字符串为默认地址
+def parse_address(address):
+    address = address or DEFAULT_ADDRESS
+    if address.startswith("unix:"):
+        return None, None, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port), None
+
+
+# 本地控制接口：在独立线程的 asyncio 事件循环中运行一个简单的 HTTP/1.1 服务（支持 keep-alive），
+# 用于脚本压测和展示机控制程序，不影响摄像头流水线：
+#   POST /commands/<命令名>          执行一个命令，例如 POST /commands/NEXT
+#   POST /commands                   按顺序执行请求体（JSON 数组）中的多个命令
+#   GET  /commands                   可用的命令名
+#   GET  /state                      当前播放状态
+#   GET  /metrics                    性能统计（Telemetry）
+#   GET  /events                     播放状态变化的事件流（Server-Sent Events），事件名为 MusicPlayer 的通知类型
+# 命令交给 dispatch(command, received_at) 处理，与手势命令走同一条路径（界面中为 GUI 线程，
+# 最终都在播放线程中依次执行），因此不会与手势同时修改播放状态。请求只等待命令进入队列，
+# 执行结果通过事件流或 /state 获得
+class ControlServer:
+    def __init__(self, player, dispatch, telemetry=None, address=DEFAULT_ADDRESS, max_events=256,
+                 max_body=1 << 20, keepalive_interval=15.0):
+        self.player = player
+        self.dispatch = dispatch
+        self.telemetry = telemetry
+        self.host, self.port, self.unix_path = parse_address(address)
+        self.max_events = max_events  # 每个事件流客户端最多积压的事件数，超过时丢弃新的事件
+        self.max_body = max_body
+        self.keepalive_interval = keepalive_interval  # 事件流空闲时发送注释行的间隔（秒），用于发现已经断开的客户端
+        self.address = None  # 实际监听的地址，端口为 0 时由系统分配
+        self.dropped_events = 0
+
+        self.__thread = None
+        self.__loop = None
+        self.__stopping = None
+        self.__started = threading.Event()
+        self.__error = None
+        self.__subscribers = set()  # 事件流客户端的 asyncio.Queue
+        self.__tasks = set()  # 正在处理的连接
+
+    # 启动服务线程并等待开始监听，端口被占用等错误在调用方线程中抛出
+    def start(self):
+        self.__thread = threading.Thread(target=asyncio.run, args=(self.__serve(),), name="control-server", daemon=True)
+        self.__thread.start()
+        self.__started.wait()
+        if self.__error is not None:
+            raise self.__error
+        return self
+
+    def stop(self):
+        if self.__loop is None or self.__loop.is_closed():
+            return
+        try:
+            self.__loop.call_soon_threadsafe(self.__stopping.set)
+        except RuntimeError:
+            # 事件循环已经结束
+            return
+        self.__thread.join(1)
+
+    async def __serve(self):
+        self.__loop = asyncio.get_running_loop()
+        self.__stopping = asyncio.Event()
+        try:
+            if self.unix_path is not None:
+                server = await asyncio.start_unix_server(self.__handle, self.unix_path)
+            else:
+                server = await asyncio.start_server(self.__handle, self.host, self.port)
+        except OSError as e:
+            self.__error = e
+            self.__started.set()
+            return
+        self.address = server.sockets[0].getsockname()
+        self.player.add_listener(self.__on_player_event)
+        self.__started.set()
+
+        async with server:
+            await self.__stopping.wait()
+            self.player.remove_listener(self.__on_player_event)
+            server.close()
+            # 事件流连接不会自己结束，需要取消
+            for task in list(self.__tasks):
+                task.cancel()
+            await asyncio.gather(*self.__tasks, return_exceptions=True)
+        if self.unix_path is not None and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    # 播放线程中的状态变化通知，只有存在事件流客户端时才转交给事件循环
+    def __on_player_event(self, kind):
+        if self.__subscribers:
+            self.__loop.call_soon_threadsafe(self.__publish, kind)
+
+    def __publish(self, kind):
+        if not self.__subscribers:
+            return
+        data = self.state()
+        for queue in self.__subscribers:
+            try:
+                queue.put_nowait((kind, data))
+            except asyncio.QueueFull:
+                self.dropped_events += 1
+
+    # 当前播放状态，在服务线程中读取播放器的属性，与界面读取状态的方式相同
+    def state(self):
+        player = self.player
+        path = player.current_path()
+        return {
+            "song": player.title_of(path) if path else None,
+            "path": path,
+            "music_id": player.music_id,
+            "playing": not player.is_pausing,
+            "volume": player.volume,
+            "favorite": player.is_current_in_favorite(),
+            "position": round(player.position(), 3),
+            "shuffle": player.play_queue.shuffle,
+            "repeat": player.play_queue.repeat,
+            "play_favorites": player.play_favorites,
+            "queued": len(player.play_queue),
+        }
+
+    async def __handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.__tasks.add(task)
+        try:
+            while True:
+                request = await self.__read_request(reader)
+                if request is None:
+                    break
+                method, path, keep_alive, body = request
+                if method == "GET" and path == "/events":
+                    await self.__stream_events(writer)
+                    break
+                start = time.perf_counter_ns()
+                status, payload = self.__route(method, path, body, start)
+                self.__respond(writer, status, payload, keep_alive)
+                await writer.drain()
+                if self.telemetry is not None:
+                    self.telemetry.record_ns("control_request", time.perf_counter_ns() - start)
+                if not keep_alive:
+                    break
+        except ValueError as e:
+            self.__respond(writer, 400, {"error": str(e)}, False)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self.__tasks.discard(task)
+            writer.close()
+
+    # 读取一个请求，返回 (方法, 路径, 是否保持连接, 请求体)，连接已经关闭时返回 None；格式错误时抛出 ValueError
+    async def __read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise ValueError("Malformed request line")
+        method, target, version = parts
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > self.max_body:
+            raise ValueError("Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection == "keep-alive" or version == "HTTP/1.1" and connection != "close"
+        return method, urlsplit(target).path.rstrip("/") or "/", keep_alive, body
+
+    def __route(self, method, path, body, received_at):
+        if path.startswith("/commands"):
+            if method == "GET" and path == "/commands":
+                return 200, [command.name for command in Command]
+            if method != "POST":
+                return 405, {"error": "Method not allowed"}
+            if path == "/commands":
+                try:
+                    names = json.loads(body or b"[]")
+                except ValueError:
+                    names = None
+                if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+                    return 400, {"error": "Request body must be a JSON array of command names"}
+            else:
+                names = [path[len("/commands/"):]]
+            try:
+                commands = [Command[name] for name in names]
+            except KeyError as e:
+                return 400, {"error": f"Unknown command: {e.args[0]}", "commands": [command.name for command in Command]}
+            for command in commands:
+                self.dispatch(command, received_at)
+            return 202, {"accepted": len(commands)}
+        if method != "GET":
+            return 405, {"error": "Method not allowed"}
+        if path == "/state":
+            return 200, self.state()
+        if path == "/metrics":
+            if self.telemetry is None:
+                return 404, {"error": "Telemetry is not enabled"}
+            return 200, self.telemetry.to_dict()
+        return 404, {"error": f"Not found: {path}"}
+
+    def __respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("UTF-8")
+        writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+
+    # 事件流：连接后先发送一次当前状态（事件名 state），之后每次状态变化发送一个事件
+    async def __stream_events(self, writer):
+        queue = asyncio.Queue(self.max_events)
+        self.__subscribers.add(queue)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+            writer.write(self.__event("state", self.state()))
+            await writer.drain()
+            while True:
+                try:
+                    kind, data = await asyncio.wait_for(queue.get(), self.keepalive_interval)
+                    writer.write(self.__event(kind, data))
+                except asyncio.TimeoutError:
+                    writer.write(b": keepalive\n\n")
+                await writer.drain()
+        finally:
+            self.__subscribers.discard(queue)
+
+    @staticmethod
+    def __event(kind, data):
+        return f"event: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("UTF-8")
+
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
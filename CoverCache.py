@@ -0,0 +1,194 @@
+import io
+import os
+import time
+import hashlib
+import threading
+import mutagen
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageDraw, ImageFilter
+from PyQt5 import QtCore, QtGui
+
+
+# 将图片裁剪出一个方形
+def crop_max_square(pil_img):
+    crop_width = min(pil_img.size)
+    crop_height = min(pil_img.size)
+    img_width, img_height = pil_img.size
+    return pil_img.crop(((img_width - crop_width) // 2,
+                         (img_height - crop_height) // 2,
+                         (img_width + crop_width) // 2,
+                         (img_height + crop_height) // 2))
+
+
+# 使用蒙版将图片处理为圆形
+def mask_circle_transparent(pil_img, blur_radius, offset=0):
+    offset = blur_radius * 2 + offset
+    mask = Image.new("L", pil_img.size, 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse((offset, offset, pil_img.size[0] - offset, pil_img.size[1] - offset), fill=255)
+    mask = mask.filter(ImageFilter.GaussianBlur(blur_radius))
+
+    result = pil_img.copy()
+    result.putalpha(mask)
+    return result
+
+
+# 从音乐文件中提取内嵌封面并处理为圆形缩略图，返回 PNG 数据；没有封面时返回 None
+def render_cover(path, size=300):
+    try:
+        # 歌曲文件可能缺失 APIC 标签(KeyError)或全部标签(TypeError, 因为对不存在的 tags 进行了索引)
+        audio = mutagen.File(path)
+        cover_data = audio.tags['APIC:'].data
+    except (KeyError, TypeError, AttributeError, mutagen.MutagenError):
+        return None
+
+    # 将图片处理为适合作封面的图，全程在内存中完成，不再写临时文件
+    trumb_width = 600
+    with Image.open(io.BytesIO(cover_data)) as mark_img:
+        im_square = crop_max_square(mark_img.convert("RGB")).resize((trumb_width, trumb_width), Image.LANCZOS)
+    im_thumb = mask_circle_transparent(im_square, 0).resize((size, size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    im_thumb.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+# 封面缓存：内存中用以文件路径为键的 LRU 保存处理好的 QImage 及加载时的修改时间，磁盘上以路径和修改时间为键保存 PNG 缩略图。
+# peek 在 GUI 线程中调用，只查询内存、不访问磁盘（连 stat 也没有）；get 在加载线程中调用，文件修改过时重新加载。
+# 磁盘命中时只读取一个小 PNG，不再解析音乐文件。
+# QImage 可以在任意线程中创建，显示时在 GUI 线程中用 QPixmap.fromImage 转换
+class CoverCache:
+    def __init__(self, cache_dir="./pictures/covers", capacity=64, size=300, default_cover="./pictures/default_cover.png"):
+        self.cache_dir = cache_dir
+        self.capacity = capacity
+        self.size = size
+        self.default_cover = default_cover
+        self.__images = OrderedDict()  # 绝对路径 -> (加载时的修改时间, QImage)
+        self.__lock = threading.Lock()
+        self.__default_image = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(path):
+        return os.path.abspath(path), os.stat(path).st_mtime_ns
+
+    def get_default(self):
+        if self.__default_image is None:
+            self.__default_image = QtGui.QImage(self.default_cover).scaled(self.size, self.size, QtCore.Qt.KeepAspectRatio)
+        return self.__default_image
+
+    # 只查询内存缓存，未命中时返回 None；返回的是加载时的封面，不检查文件是否已经修改
+    def peek(self, path):
+        path = os.path.abspath(path)
+        with self.__lock:
+            entry = self.__images.get(path)
+            if entry is None:
+                return None
+            self.__images.move_to_end(path)
+            return entry[1]
+
+    # 获取封面，依次查询内存缓存、磁盘缓存，都未命中时解析音乐文件；没有封面时返回默认封面
+    def get(self, path):
+        try:
+            key = self.key(path)
+        except OSError:
+            return self.get_default()
+        path, mtime = key
+        with self.__lock:
+            entry = self.__images.get(path)
+            if entry is not None and entry[0] == mtime:
+                self.__images.move_to_end(path)
+                return entry[1]
+
+        image = self.__load(key)
+        with self.__lock:
+            self.__images[path] = (mtime, image)
+            self.__images.move_to_end(path)
+            while len(self.__images) > self.capacity:
+                self.__images.popitem(last=False)
+        return image
+
+    def __load(self, key):
+        path, mtime = key
+        name = hashlib.sha1(f"{path}\0{mtime}\0{self.size}".encode("utf-8")).hexdigest()
+        cover_path = os.path.join(self.cache_dir, name + ".png")
+        # 没有封面的文件同样记录在磁盘上，下次不必再解析
+        missing_path = os.path.join(self.cache_dir, name + ".none")
+
+        if os.path.exists(cover_path):
+            image = QtGui.QImage(cover_path)
+            if not image.isNull():
+                return image
+        elif os.path.exists(missing_path):
+            return self.get_default()
+
+        data = render_cover(path, self.size)
+        if data is None:
+            self.__write(missing_path, b"")
+            return self.get_default()
+        self.__write(cover_path, data)
+        image = QtGui.QImage()
+        image.loadFromData(data, "PNG")
+        return image
+
+    # 先写入临时文件再替换，避免中途退出留下不完整的缩略图
+    def __write(self, path, data):
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(e, type(e))
+
+
+# 在后台线程池中加载封面：request 的结果通过 cover_ready 信号交给 GUI 线程，
+# prefetch 只把封面预先载入缓存，切歌时即可直接从内存取用
+class CoverLoader(QtCore.QObject):
+    cover_ready = QtCore.pyqtSignal(str, QtGui.QImage)
+
+    def __init__(self, cache, workers=2, telemetry=None):
+        super(CoverLoader, self).__init__()
+        self.cache = cache
+        self.telemetry = telemetry
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cover")
+        self.__pending = {}  # 正在加载的路径 -> 加载完成后是否需要发出信号
+        self.__lock = threading.Lock()
+
+    def request(self, path):
+        self.__submit(path, True)
+
+    def prefetch(self, paths):
+        for path in paths:
+            if self.cache.peek(path) is None:
+                self.__submit(path, False)
+
+    def shutdown(self):
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    def __submit(self, path, notify):
+        with self.__lock:
+            if path in self.__pending:
+                self.__pending[path] = self.__pending[path] or notify
+                return
+            self.__pending[path] = notify
+        try:
+            self.__executor.submit(self.__load, path)
+        except RuntimeError:
+            # 线程池已关闭
+            with self.__lock:
+                self.__pending.pop(path, None)
+
+    def __load(self, path):
+        start = time.perf_counter_ns()
+        try:
+            image = self.cache.get(path)
+        except Exception as e:
+            print(e, type(e))
+            image = self.cache.get_default()
+        if self.telemetry is not None:
+            self.telemetry.record_ns("cover_load", time.perf_counter_ns() - start)
+        with self.__lock:
+            notify = self.__pending.pop(path, False)
+        if notify:
+            self.cover_ready.emit(path, image)
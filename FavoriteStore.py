@@ -0,0 +1,157 @@
+import os
+import json
+import pickle
+import threading
+from itertools import islice
+
+
+# 用户数据（收藏等）的默认保存目录，可以通过环境变量 GESTURE_PLAYER_HOME 修改
+def default_data_dir():
+    return os.environ.get("GESTURE_PLAYER_HOME") or os.path.join(os.path.expanduser("~"), ".gesture_music_player")
+
+
+# 只能读取内置类型（列表、字符串等）的 pickle，拒绝加载任何类或函数，读取不可信的 pickle 文件时不会执行代码
+class RestrictedUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"不允许加载 {module}.{name}")
+
+
+# 收藏夹：用 dict 保存收藏的歌曲路径，查询和增删都是 O(1)，并保持收藏的先后顺序。
+# 数据由快照文件（JSON 数组）和日志文件（每行一条 JSON 操作记录）组成：
+# 每次修改只在日志末尾追加一行并立即写入磁盘，程序崩溃也不会丢失；
+# 日志超过 compact_every 条或关闭时将全部收藏写成新的快照并清空日志，快照先写临时文件再替换
+class FavoriteStore:
+    def __init__(self, path=None, compact_every=256):
+        if path is None:
+            path = os.path.join(default_data_dir(), "favorites.json")
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_every = compact_every
+        self.__lock = threading.Lock()
+        self.__paths = {}
+        self.__journal_size = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        damaged = self.__load()
+        self.__journal = open(self.journal_path, "a", encoding="UTF-8")
+        if damaged:
+            # 避免新的记录接在不完整的行后面
+            self.compact()
+
+    def __contains__(self, path):
+        return path in self.__paths
+
+    def __len__(self):
+        return len(self.__paths)
+
+    def __iter__(self):
+        with self.__lock:
+            return iter(list(self.__paths))
+
+    # 前 count 首收藏
+    def head(self, count):
+        with self.__lock:
+            return list(islice(self.__paths, count))
+
+    def add(self, path):
+        with self.__lock:
+            if path in self.__paths:
+                return
+            self.__paths[path] = None
+            self.__append("add", path)
+
+    def remove(self, path):
+        with self.__lock:
+            if path not in self.__paths:
+                return
+            del self.__paths[path]
+            self.__append("remove", path)
+
+    # 切换收藏状态，返回切换后是否处于收藏中
+    def toggle(self, path):
+        if path in self:
+            self.remove(path)
+            return False
+        self.add(path)
+        return True
+
+    # 一次性导入旧版本保存在 favorite.pickle 中的收藏（路径列表）：只在收藏夹为空时导入，
+    # 导入后将旧文件重命名为 .bak，之后不会再次导入。文件来自工作目录，用 RestrictedUnpickler 读取，
+    # 内容不是字符串列表或读取失败时只打印错误，不影响启动
+    def import_pickle(self, pickle_path):
+        if len(self) > 0 or not os.path.exists(pickle_path):
+            return 0
+        try:
+            with open(pickle_path, "rb") as f:
+                paths = RestrictedUnpickler(f).load()
+            if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+                raise ValueError(f"{pickle_path} 不是歌曲路径列表")
+            with self.__lock:
+                for path in paths:
+                    self.__paths[path] = None
+                self.__compact()
+            os.replace(pickle_path, pickle_path + ".bak")
+        except Exception as e:
+            print(e, type(e))
+            return 0
+        return len(paths)
+
+    def compact(self):
+        with self.__lock:
+            self.__compact()
+
+    def close(self):
+        with self.__lock:
+            if self.__journal.closed:
+                return
+            self.__compact()
+            self.__journal.close()
+
+    # 读取快照并重放日志，日志中存在不完整的记录时返回 True
+    def __load(self):
+        damaged = False
+        try:
+            with open(self.path, "r", encoding="UTF-8") as f:
+                self.__paths = dict.fromkeys(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(e, type(e))
+
+        try:
+            with open(self.journal_path, "r", encoding="UTF-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 写到一半时崩溃留下的不完整记录
+                        damaged = True
+                        continue
+                    if record.get("op") == "add":
+                        self.__paths[record["path"]] = None
+                    elif record.get("op") == "remove":
+                        self.__paths.pop(record["path"], None)
+                    self.__journal_size += 1
+        except FileNotFoundError:
+            pass
+        return damaged
+
+    def __append(self, op, path):
+        self.__journal.write(json.dumps({"op": op, "path": path}, ensure_ascii=False) + "\n")
+        self.__journal.flush()
+        os.fsync(self.__journal.fileno())
+        self.__journal_size += 1
+        if self.__journal_size >= self.compact_every:
+            self.__compact()
+
+    def __compact(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="UTF-8") as f:
+            json.dump(list(self.__paths), f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        # 快照已经包含日志中的全部修改，之后再清空日志
+        self.__journal.truncate(0)
+        self.__journal.seek(0)
+        self.__journal_size = 0
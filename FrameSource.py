@@ -0,0 +1,171 @@
+import os
+import sys
+import time
+import json
+import logging
+import cv2 as cv
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 录制目录的文件组成，每个文件的第一维都是帧序号：
+#   timestamps.npy  (N,) float64，采集时间（秒）
+#   valid.npy       (N,) int8，1 表示检测到手，0 表示没有检测到手，-1 表示该帧未经推理（被流水线丢弃）
+#   landmarks.npy   (N, 21, 2) int32，关键点坐标（翻转后的画面坐标系）
+#   frames.npy      (N, H, W, 3) uint8，可选，摄像头原始画面（未翻转）
+#   meta.json       录制参数
+NOT_INFERRED = -1
+
+
+# 摄像头画面来源
+class CameraSource:
+    def __init__(self, index=0, width=640, height=480):
+        # DirectShow 只在 Windows 上可用，其他平台交给 OpenCV 自动选择
+        api = cv.CAP_DSHOW if sys.platform == "win32" else cv.CAP_ANY
+        self.camera = cv.VideoCapture(index, api)
+        self.camera.set(3, width)
+        self.camera.set(4, height)
+        self.timestamp = 0.0
+        self.landmark = None  # 摄像头画面需要实时推理，不提供关键点
+        self.__frame = None
+
+    # 每次读取都写入同一块缓冲区，调用方需要在下一次 read 之前处理或复制画面
+    def read(self):
+        ret, frame = self.camera.read(self.__frame)
+        self.timestamp = time.perf_counter()
+        if ret:
+            self.__frame = frame
+        return ret, frame
+
+    def release(self):
+        self.camera.release()
+
+
+# 录制数据回放，可以按录制时的速度回放，也可以全速回放；
+# 没有录制画面或指定 landmarks_only 时只回放关键点，frame 为 None，流水线会跳过推理
+class ReplaySource:
+    def __init__(self, path, realtime=True, landmarks_only=False):
+        self.realtime = realtime
+        self.timestamps = np.load(os.path.join(path, "timestamps.npy"))
+        self.valid = np.load(os.path.join(path, "valid.npy"))
+        self.landmarks = np.load(os.path.join(path, "landmarks.npy"), mmap_mode="r")
+        frames_path = os.path.join(path, "frames.npy")
+        self.frames = None
+        if not landmarks_only and os.path.exists(frames_path):
+            self.frames = np.load(frames_path, mmap_mode="r")
+
+        self.timestamp = 0.0
+        self.landmark = None
+        self.__index = 0
+        self.__started_at = None
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def read(self):
+        # 只回放关键点时跳过录制时未经推理的帧
+        while self.frames is None and self.__index < len(self.timestamps) and self.valid[self.__index] == NOT_INFERRED:
+            self.__index += 1
+        if self.__index >= len(self.timestamps):
+            return False, None
+
+        i = self.__index
+        self.__index += 1
+        self.timestamp = float(self.timestamps[i])
+        if self.realtime:
+            if self.__started_at is None:
+                self.__started_at = time.perf_counter() - (self.timestamp - self.timestamps[0])
+            delay = self.__started_at + (self.timestamp - self.timestamps[0]) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        if self.frames is not None:
+            # 直接返回内存映射中的画面，不复制；流水线翻转时会写入自己的缓冲区
+            self.landmark = None
+            return True, self.frames[i]
+        # 录制时没有检测到手的帧用空数组表示
+        self.landmark = np.array(self.landmarks[i]) if self.valid[i] == 1 else np.empty((0, 2), dtype=np.int32)
+        return True, None
+
+    def release(self):
+        pass
+
+
+# 将采集时间、关键点和（可选的）原始画面写入内存映射的 .npy 文件
+# 文件按 capacity 预先分配，写满后不再记录；close 时截断为实际录制的帧数
+class SessionRecorder:
+    def __init__(self, path, capacity=9000, save_frames=True):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.capacity = capacity
+        self.save_frames = save_frames
+        self.count = 0
+
+        self.__arrays = {
+            "timestamps.npy": np.lib.format.open_memmap(os.path.join(path, "timestamps.npy"), "w+", np.float64, (capacity,)),
+            "valid.npy": np.lib.format.open_memmap(os.path.join(path, "valid.npy"), "w+", np.int8, (capacity,)),
+            "landmarks.npy": np.lib.format.open_memmap(os.path.join(path, "landmarks.npy"), "w+", np.int32, (capacity, 21, 2)),
+        }
+        self.__arrays["valid.npy"][:] = NOT_INFERRED
+
+    # 记录一帧，返回帧序号；录制已满时返回 None
+    def write_frame(self, timestamp, frame=None):
+        if self.count >= self.capacity:
+            if self.count == self.capacity:
+                logger.warning("录制已达到 %d 帧上限，后续画面不再记录", self.capacity)
+                self.count += 1
+            return None
+        index = self.count
+        self.__arrays["timestamps.npy"][index] = timestamp
+        if frame is not None and self.save_frames:
+            # 画面尺寸以第一帧为准
+            if "frames.npy" not in self.__arrays:
+                self.__arrays["frames.npy"] = np.lib.format.open_memmap(
+                    os.path.join(self.path, "frames.npy"), "w+", np.uint8, (self.capacity,) + frame.shape)
+            self.__arrays["frames.npy"][index] = frame
+        self.count += 1
+        return index
+
+    # 补充某一帧的推理结果，landmark 为 None 表示没有检测到手
+    def write_landmark(self, index, landmark):
+        if index is None or index >= self.capacity:
+            return
+        if landmark is None:
+            self.__arrays["valid.npy"][index] = 0
+        else:
+            self.__arrays["landmarks.npy"][index] = landmark
+            self.__arrays["valid.npy"][index] = 1
+
+    def close(self):
+        count = min(self.count, self.capacity)
+        names = list(self.__arrays)
+        for array in self.__arrays.values():
+            array.flush()
+        # 先释放内存映射再截断文件
+        frame_shape = list(self.__arrays["frames.npy"].shape[1:]) if "frames.npy" in self.__arrays else None
+        self.__arrays = {}
+        for name in names:
+            truncate_npy(os.path.join(self.path, name), count)
+        with open(os.path.join(self.path, "meta.json"), "w", encoding="UTF-8") as f:
+            json.dump({"frames": count, "frame_shape": frame_shape}, f)
+        logger.info("录制完成：%d 帧，保存在 %s", count, self.path)
+
+
+# 原地修改 .npy 文件头中的第一维长度并截断数据，不需要重新写入整个文件
+def truncate_npy(path, count):
+    with open(path, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        data_offset = f.tell()
+        if count >= shape[0]:
+            return
+        prefix = 10 if version == (1, 0) else 12  # 魔数、版本号与头部长度字段
+        header = "{'descr': %r, 'fortran_order': %r, 'shape': %r, }" % (
+            np.lib.format.dtype_to_descr(dtype), fortran_order, (count,) + tuple(shape[1:]))
+        # 保持头部总长度不变，用空格补齐并以换行结尾
+        f.seek(prefix)
+        f.write(header.ljust(data_offset - prefix - 1).encode("latin1") + b"\n")
+        f.truncate(data_offset + count * int(np.prod(shape[1:], dtype=np.int64)) * dtype.itemsize)
@@ -0,0 +1,125 @@
+import numpy as np
+from itertools import combinations
+from Command import Command
+
+# 参与距离特征的关节点：五个指尖两两之间的距离，以及比心判断用到的大拇指末端关节与食指中间关节
+FINGER_TIPS = (4, 8, 12, 16, 20)
+DISTANCE_PAIRS = tuple(combinations(FINGER_TIPS, 2)) + ((3, 6),)
+PAIR_FIRST, PAIR_SECOND = np.array(DISTANCE_PAIRS).T
+FEATURE_SIZE = 20 * 2 + len(DISTANCE_PAIRS)
+
+
+# 将 (N, 21, 2) 的关键点转换为 (N, FEATURE_SIZE) 的特征，与手的位置、大小、旋转和左右手无关：
+# 以手腕为原点，以手腕到中指根部的方向为纵轴、其长度为单位长度，
+# 再按食指根部与小拇指根部的左右关系统一镜像，最后附加关节点之间的归一化距离
+def landmark_features(landmarks):
+    points = np.asarray(landmarks, dtype=np.float64)
+    points = points - points[:, :1]
+    axis = points[:, 9]
+    scale = np.maximum(np.hypot(axis[:, 0], axis[:, 1]), 1e-6)
+    # 每帧的旋转矩阵，两行分别为新的横轴与纵轴方向，同时除以单位长度
+    basis = np.empty((len(points), 2, 2))
+    basis[:, 1] = axis
+    basis[:, 0, 0] = axis[:, 1]
+    basis[:, 0, 1] = -axis[:, 0]
+    basis /= (scale ** 2)[:, None, None]
+    normalized = points @ basis.transpose(0, 2, 1)
+    normalized[..., 0] *= np.where(normalized[:, 5, 0] >= normalized[:, 17, 0], 1.0, -1.0)[:, None]
+
+    diff = normalized[:, PAIR_FIRST] - normalized[:, PAIR_SECOND]
+    distances = np.hypot(diff[..., 0], diff[..., 1])
+    return np.concatenate([normalized[:, 1:].reshape(len(points), -1), distances], axis=1)
+
+
+# 基于关键点特征的静态手势分类器：单隐层 MLP（ReLU + softmax），只依赖 NumPy，在 CPU 上逐帧推理约几十微秒。
+# 输出与规则识别相同的 Command，最高概率低于 min_confidence 时返回 Command.NONE。
+# 训练与评估见 tools/train_classifier.py，训练好的参数保存为 .npz 文件
+class GestureClassifier:
+    def __init__(self, commands, weights, mean, std, min_confidence=0.6):
+        self.commands = list(commands)
+        self.w1, self.b1, self.w2, self.b2 = weights
+        self.mean = mean
+        self.std = std
+        self.min_confidence = min_confidence
+
+    # landmarks 为 (N, 21, 2) 的关键点，labels 为对应的 Command；类别样本数不均衡时按样本数的倒数加权
+    @classmethod
+    def train(cls, landmarks, labels, hidden=64, epochs=200, batch_size=256, learning_rate=0.01,
+              weight_decay=1e-4, min_confidence=0.6, seed=0):
+        commands = sorted(set(labels), key=lambda command: command.value)
+        index = {command: i for i, command in enumerate(commands)}
+        targets = np.array([index[label] for label in labels])
+        features = landmark_features(landmarks)
+        mean = features.mean(axis=0)
+        std = features.std(axis=0) + 1e-6
+        inputs = (features - mean) / std
+
+        rng = np.random.default_rng(seed)
+        weights = [rng.normal(0, np.sqrt(2 / FEATURE_SIZE), (FEATURE_SIZE, hidden)), np.zeros(hidden),
+                   rng.normal(0, np.sqrt(1 / hidden), (hidden, len(commands))), np.zeros(len(commands))]
+        class_weights = len(targets) / (len(commands) * np.bincount(targets, minlength=len(commands)))
+
+        # Adam
+        moments = [np.zeros_like(w) for w in weights]
+        velocities = [np.zeros_like(w) for w in weights]
+        beta1, beta2, step = 0.9, 0.999, 0
+        for _ in range(epochs):
+            order = rng.permutation(len(inputs))
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                x, y = inputs[batch], targets[batch]
+                hidden_out = np.maximum(x @ weights[0] + weights[1], 0)
+                probabilities = softmax(hidden_out @ weights[2] + weights[3])
+
+                # 加权交叉熵对 logits 的梯度
+                sample_weights = class_weights[y] / class_weights[y].sum()
+                grad_logits = probabilities
+                grad_logits[np.arange(len(y)), y] -= 1
+                grad_logits *= sample_weights[:, None]
+                grad_hidden = (grad_logits @ weights[2].T) * (hidden_out > 0)
+                grads = [x.T @ grad_hidden + weight_decay * weights[0], grad_hidden.sum(axis=0),
+                         hidden_out.T @ grad_logits + weight_decay * weights[2], grad_logits.sum(axis=0)]
+
+                step += 1
+                for w, g, m, v in zip(weights, grads, moments, velocities):
+                    m *= beta1
+                    m += (1 - beta1) * g
+                    v *= beta2
+                    v += (1 - beta2) * g * g
+                    w -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + 1e-8)
+        return cls(commands, weights, mean, std, min_confidence)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            commands = [Command[name] for name in data["commands"]]
+            weights = (data["w1"], data["b1"], data["w2"], data["b2"])
+            return cls(commands, weights, data["mean"], data["std"], float(data["min_confidence"]))
+
+    def save(self, path):
+        np.savez(path, commands=np.array([command.name for command in self.commands]),
+                 w1=self.w1, b1=self.b1, w2=self.w2, b2=self.b2, mean=self.mean, std=self.std,
+                 min_confidence=self.min_confidence)
+
+    # 返回 (N, 类别数) 的概率，类别顺序与 self.commands 一致
+    def predict_proba(self, landmarks):
+        inputs = (landmark_features(landmarks) - self.mean) / self.std
+        hidden_out = np.maximum(inputs @ self.w1 + self.b1, 0)
+        return softmax(hidden_out @ self.w2 + self.b2)
+
+    def predict_batch(self, landmarks):
+        probabilities = self.predict_proba(landmarks)
+        best = probabilities.argmax(axis=1)
+        return [self.commands[i] if probabilities[n, i] >= self.min_confidence else Command.NONE
+                for n, i in enumerate(best)]
+
+    # 单帧识别，可以直接代替 GestureRecognizer 的规则识别
+    def predict(self, landmark):
+        probabilities = self.predict_proba(np.asarray(landmark)[None])[0]
+        best = int(probabilities.argmax())
+        return self.commands[best] if probabilities[best] >= self.min_confidence else Command.NONE
+
+
+def softmax(logits):
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
@@ -1,31 +1,62 @@
+import time
+import logging
 import cv2 as cv
-import mediapipe as mp
-from enum import Enum, unique, auto
-from fingersVector import fingersUp, vectorSize, vectorAngle, mkVector, vectorAngle2
-
-@unique
-class Command(Enum):
-    VOLUME_UP = auto()
-    VOLUME_DOWN = auto()
-    TOGGLE = auto()
-    NEXT = auto()
-    PREVIOUS = auto()
-    TOGGLE_FAVORITE = auto()
-    EXIT = auto()
-    NONE = auto()
+import numpy as np
+from Command import Command
+from HandTracker import HandTracker
+from TrajectoryEngine import TrajectoryEngine
+from fingersVector import fingersUp, vectorSize, vectorAngle
+
+logger = logging.getLogger(__name__)
+
+
+# 比心：大拇指末端关节贴近食指中间关节，且两指尖在食指中间关节处的夹角小于 90°
+def is_finger_heart(landmark):
+    return vectorSize(landmark[3], landmark[6]) < 20 and vectorAngle(landmark[4], landmark[6], landmark[8]) < 90
+
+
+# 将五根手指的状态（大拇指在最高位）压缩为 5 位编码
+def fingers_code(fingers_status):
+    code = 0
+    for status in fingers_status:
+        code = (code << 1) | status
+    return code
+
+
+# 保持手势：只伸出食指。左右挥手之后做出这个手势并停住，会连续切换歌曲
+HOLD_POSE = fingers_code((0, 1, 0, 0, 0))
+
 
 class GestureRecognizer:
+    # 手势注册表：静态手势通过 fingers 给出五指状态（大拇指到小拇指），可选的 check 用于额外的几何判断；
+    # 不带 fingers 的为动态手势，由 gesture_recognise 单独识别
     gesture_functions = [
-        {"gesture": "V形", "function": "播放/暂停", "command": Command.TOGGLE},
-        {"gesture": "左挥手", "function": "上一曲", "command": Command.PREVIOUS},
-        {"gesture": "右挥手", "function": "下一曲", "command": Command.NEXT},
-        {"gesture": "大拇指", "function": "增加音量", "command": Command.VOLUME_UP},
-        {"gesture": "握拳", "function": "减少音量", "command": Command.VOLUME_DOWN},
-        {"gesture": "比心", "function": "收藏/取消收藏", "command": Command.TOGGLE_FAVORITE},
-        {"gesture": "Rock", "function": "关闭", "command": Command.EXIT},
+        {"gesture": "V形", "function": "播放/暂停", "command": Command.TOGGLE, "fingers": (0, 1, 1, 0, 0)},
+        {"gesture": "左挥手", "function": "上一曲（之后伸出食指停住连续切换）", "command": Command.PREVIOUS},
+        {"gesture": "右挥手", "function": "下一曲（之后伸出食指停住连续切换）", "command": Command.NEXT},
+        {"gesture": "上挥手", "function": "开关随机播放", "command": Command.SHUFFLE},
+        {"gesture": "下挥手", "function": "从头播放", "command": Command.RESTART},
+        {"gesture": "顺时针画圈", "function": "快进", "command": Command.SEEK_FORWARD},
+        {"gesture": "逆时针画圈", "function": "快退", "command": Command.SEEK_BACKWARD},
+        {"gesture": "大拇指", "function": "增加音量", "command": Command.VOLUME_UP, "fingers": (1, 0, 0, 0, 0)},
+        {"gesture": "握拳", "function": "减少音量", "command": Command.VOLUME_DOWN, "fingers": (0, 0, 0, 0, 0)},
+        {"gesture": "比心", "function": "收藏/取消收藏", "command": Command.TOGGLE_FAVORITE, "fingers": (1, 1, 0, 0, 0), "check": is_finger_heart},
+        {"gesture": "Rock", "function": "关闭", "command": Command.EXIT, "fingers": (0, 1, 0, 0, 1)},
     ]
 
-    def __init__(self):
+    # latency_budget：每帧推理的耗时预算（秒），超出时降低推理输入的分辨率，最低缩放到 min_scale。
+    #   推理始终在整幅画面上进行：视频流模式的 MediaPipe 自己会根据上一帧的关键点裁剪手部区域，
+    #   只在跟踪丢失时运行手掌检测，不需要在外部裁剪画面
+    # swipe_speed、swipe_window：手势中心在 swipe_window 秒内的平均速度超过 swipe_speed（像素/秒）时判定为挥手，
+    # 推理帧率较低时窗口按实际的采样间隔放宽，速度阈值不变，与帧率无关（原先的判定条件为 4 帧内位移超过 180 像素）；挥手、画圈等动态手势由 TrajectoryEngine 识别
+    # max_num_hands：最多检测的手的数量，多只手在同一次推理中检测，由 arbitration 指定的策略（见 HandTracker）
+    # 选出控制播放器的手；hold_time 为 first_hold 策略获得控制权需要保持手势的时间（秒）
+    # classifier：可选的 GestureClassifier，提供时代替按五指状态查表的规则识别静态手势
+    def __init__(self, latency_budget=0.025, min_scale=0.5,
+                 swipe_speed=1200, swipe_window=0.15, max_num_hands=1, arbitration="largest", hold_time=0.3,
+                 classifier=None):
+        # mediapipe 导入耗时约 1 秒，只在创建识别器时导入，主窗口可以先显示出来
+        import mediapipe as mp
         # 绘制关键点与连接线函数
         self.mp_drawing = mp.solutions.drawing_utils
         self.handMsStyle=self.mp_drawing.DrawingSpec(color=(0,0,255),thickness=int(5))#关键点样式
@@ -33,80 +64,209 @@ class GestureRecognizer:
         #手部检测函数
         self.mp_hands = mp.solutions.hands
         self.hands = self.mp_hands.Hands(static_image_mode=False,#检测的是视频流还是静态图片，False为视频流，True为图片
-                                         max_num_hands=1,#检测出手的最大数量
+                                         max_num_hands=max_num_hands,#检测出手的最大数量
                                          min_detection_confidence=0.75,#首部检测的最小置信度，大于该值则认为检测成功
                                          min_tracking_confidence=0.75)#目标跟踪模型的最小置信度
 
+        self.classifier = classifier
+        # 注册表按实例复制，在一个识别器上注册的手势不会影响其他识别器
+        self.gesture_functions = list(type(self).gesture_functions)
+        self.__build_table()
+
+        # 预分配关键点缓冲区，每帧原地写入，避免反复构建坐标列表
+        # 注意：get_landmark 返回的就是该缓冲区本身，需要跨帧保存时请先复制
+        self.__landmark_ratio = np.empty((21, 2), dtype=np.float64)
+        self.__landmark = np.empty((21, 2), dtype=np.int32)
+        self.__landmarks = np.empty((max_num_hands, 21, 2), dtype=np.int32)  # 本帧检测到的全部手
+        self.__buffers = [np.empty(0, np.uint8), np.empty(0, np.uint8)]  # 缩放和颜色转换的输出
+
+        self.latency_budget = latency_budget
+        self.min_scale = min_scale
+        self.scale = 1.0  # 推理输入相对于原始画面的缩放比例
+
+        self.swipe_speed = swipe_speed
+        self.swipe_window = swipe_window
+        # 手势中心历史等时间状态保存在各只手的 TrackedHand 中，切换控制的手时不会混在一起
+        self.tracker = HandTracker(arbitration, self.__static_gesture_recognise, hold_time=hold_time)
+        self.static_command = Command.NONE
+        self.hold_pose = False  # 最近一次推理的手形是否为保持手势，与 static_command 一样供没有推理的帧沿用
+
 
-    def gesture_recognise(self, frame, landmark, previous_center) -> Command:
-        # 静态手势识别
+    # 为本识别器注册新的手势，ListPane 会显示注册表中的全部手势，因此需要在界面创建前注册
+    def register_gesture(self, gesture, function, command, fingers=None, check=None):
+        gesture_function = {"gesture": gesture, "function": function, "command": command}
+        if fingers is not None:
+            gesture_function["fingers"] = tuple(fingers)
+        if check is not None:
+            gesture_function["check"] = check
+        self.gesture_functions.append(gesture_function)
+        self.__build_table()
+
+
+    # 由五指状态编码直接查表得到候选手势，每帧的分类开销与注册的手势数量无关
+    def __build_table(self):
+        self.__gesture_table = [[] for _ in range(32)]
+        for gesture_function in self.gesture_functions:
+            if "fingers" in gesture_function:
+                self.__gesture_table[fingers_code(gesture_function["fingers"])].append(gesture_function)
+
+
+    # 控制播放器的手的跟踪编号，没有手获得控制权时为 None
+    @property
+    def active_hand_id(self):
+        return None if self.tracker.active is None else self.tracker.active.id
+
+
+    # 识别一帧的手势，timestamp 为画面的采集时间（秒）
+    def gesture_recognise(self, frame, landmark, timestamp) -> Command:
+        # 关键点不是由 get_landmark 得到时（回放录制的关键点、离线分析），在这里更新跟踪状态
+        if landmark is not self.__landmark:
+            self.tracker.update([landmark], timestamp)
+        hand = self.tracker.active
+        if hand is None:
+            # 还没有手获得控制权
+            self.static_command = Command.NONE
+            self.hold_pose = False
+            return Command.NONE
+
+        # 静态手势识别，结果保留在 static_command 中，供没有推理的帧沿用
         command = self.__static_gesture_recognise(landmark)
+        hand.set_command(command, timestamp)
+        self.static_command = command
+        self.hold_pose = fingers_code(fingersUp(landmark)) == HOLD_POSE
 
         # 动态手势识别
-        current_center = landmark[9]
-        cv.circle(frame, current_center, 10, (0, 255, 255), -1)
-        center_vector = mkVector(current_center, previous_center)
-        current_previous_distance = vectorSize(previous_center, current_center)
-        x_axis = (1, 0)
-        angle = vectorAngle2(center_vector, x_axis)
-        if center_vector[0] > 0 and current_previous_distance > 180 and angle < 30:
-            command = Command.NEXT
-            print("右挥手")
-        elif center_vector[0] < 0 and current_previous_distance > 180 and angle > 150:
-            command = Command.PREVIOUS
-            print("左挥手")
-
-        return current_center, command
+        # 复制为整数元组，避免引用下一帧会被覆盖的关键点缓冲区
+        current_center = (int(landmark[9][0]), int(landmark[9][1]))
+        swipe = self.track_center(frame, current_center, timestamp)
+        return command if swipe == Command.NONE else swipe
 
 
-    def __static_gesture_recognise(self, landmark) -> Command:
-        command = Command.NONE
-        fingers_status = fingersUp(landmark)
-        if (fingers_status[0] == 0 and fingers_status[1] == 1 and fingers_status[2] == 1 and fingers_status[3] == 0 and fingers_status[4] == 0):
-            command = Command.TOGGLE
-            print("V")
-        elif(fingers_status[0]==1 and fingers_status[1]==0 and fingers_status[2]==0 and fingers_status[3]==0 and fingers_status[4]==0):
-            command = Command.VOLUME_UP
-            print("大拇指")
-        elif(fingers_status[0]==0 and fingers_status[1]==0 and fingers_status[2]==0 and fingers_status[3]==0 and fingers_status[4]==0):
-            command = Command.VOLUME_DOWN
-            print("握拳")
-        elif (fingers_status[0] == 0 and fingers_status[1] == 1 and fingers_status[2] == 0 and fingers_status[3] == 0 and fingers_status[4] == 1):
-            command = Command.EXIT
-            print("Rock")
-        elif (fingers_status[0] == 1 and fingers_status[1] == 1 and fingers_status[2] == 0 and fingers_status[3] == 0 and fingers_status[4] == 0
-        and vectorSize(landmark[3], landmark[6]) < 20 and vectorAngle(landmark[4], landmark[6], landmark[8]) < 90):
-            command = Command.TOGGLE_FAVORITE
-            print("比心")
-        else:
-            # 设置留空手势，可以更好地分隔不同操作
-            command = Command.NONE
-            print("空")
+    # 根据手势中心的轨迹识别挥手、画圈等动态手势，没有推理的帧也可以传入预测的中心位置
+    def track_center(self, frame, center, timestamp) -> Command:
+        # 离线分析时没有画面，frame 为 None
+        if frame is not None:
+            cv.circle(frame, center, 10, (0, 255, 255), -1)
 
+        hand = self.tracker.active
+        if hand is None:
+            return Command.NONE
+        if hand.trajectory is None:
+            hand.trajectory = TrajectoryEngine(self.swipe_speed, self.swipe_window)
+        command = hand.trajectory.update(timestamp, center, self.hold_pose)
+        if command != Command.NONE:
+            logger.debug(command.name)
+            # 动态手势期间的手形不作为静态手势
+            self.static_command = Command.NONE
         return command
 
 
-    def get_landmark(self, frame):
-        imgRGB = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
-        result = self.hands.process(imgRGB)
-        hand_point = result.multi_hand_landmarks  # 返回21个手部关键点的坐标，其值为比例
+    # 清空控制播放器的手的轨迹，在手部丢失时调用
+    def reset_tracking(self):
+        if self.tracker.active is not None and self.tracker.active.trajectory is not None:
+            self.tracker.active.trajectory.reset()
+        self.static_command = Command.NONE
+        self.hold_pose = False
+
+
+    def __static_gesture_recognise(self, landmark) -> Command:
+        if self.classifier is not None:
+            command = self.classifier.predict(landmark)
+            logger.debug(command.name)
+            return command
+        return self.rule_based_gesture(landmark)
+
+
+    # 按五指状态与注册表中的额外判断识别静态手势，也用于与分类器的离线对比
+    def rule_based_gesture(self, landmark) -> Command:
+        code = fingers_code(fingersUp(landmark))
+        for gesture_function in self.__gesture_table[code]:
+            check = gesture_function.get("check")
+            if check is None or check(landmark):
+                logger.debug(gesture_function["gesture"])
+                return gesture_function["command"]
+
+        # 设置留空手势，可以更好地分隔不同操作
+        logger.debug("空")
+        return Command.NONE
+
+
+    # 检测画面中的手并返回控制播放器的那只手的关键点；timestamp 为画面的采集时间（秒），用于多手跟踪
+    def get_landmark(self, frame, draw=True, timestamp=None):
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        start = time.perf_counter()
+        handlms = self.__detect(frame)
+        self.__adapt_scale(time.perf_counter() - start)
+
+        # 当关键点不存在时
+        if handlms is None:
+            self.tracker.update([], timestamp)
+            raise RuntimeError()
+
+        landmarks = self.__landmarks[:len(handlms)]
+        for landmark, hand in zip(landmarks, handlms):
+            self.__to_pixels(hand, frame.shape[1], frame.shape[0], landmark)
+        hand = self.tracker.update(landmarks, timestamp)
+        # 控制播放器的手本帧没有被检测到
+        if hand is None:
+            raise RuntimeError()
+        np.copyto(self.__landmark, hand.landmark)
+
+        if draw:
+            for landmark in landmarks:
+                self.draw_landmark(frame, landmark)
+            if len(landmarks) > 1:
+                cv.putText(frame, f"#{hand.id}", (int(hand.landmark[0][0]), int(hand.landmark[0][1]) + 30),
+                           cv.FONT_HERSHEY_PLAIN, 2, (0, 255, 255), thickness=2)
+        return self.__landmark
+
+
+    # lm.x 表示在画面大小下的比例，乘以画面大小将其转换为像素坐标，写入 out
+    def __to_pixels(self, hand, width, height, out):
+        for i, lm in enumerate(hand.landmark):
+            self.__landmark_ratio[i, 0] = lm.x
+            self.__landmark_ratio[i, 1] = lm.y
+        self.__landmark_ratio *= (width, height)
+        # 与 int() 一致，向零取整
+        np.copyto(out, self.__landmark_ratio, casting="unsafe")
+
+
+    # 对整幅画面进行一次推理，返回检测到的全部手的关键点（比例坐标），没有检测到手时返回 None
+    def __detect(self, frame):
+        image = frame
+        if self.scale < 1.0:
+            size = (max(round(frame.shape[1] * self.scale), 1), max(round(frame.shape[0] * self.scale), 1))
+            image = cv.resize(image, size, dst=self.__buffer(0, (size[1], size[0], 3)), interpolation=cv.INTER_AREA)
+        imgRGB = cv.cvtColor(image, cv.COLOR_BGR2RGB, dst=self.__buffer(1, image.shape))
         result = self.hands.process(imgRGB)
         hand_point = result.multi_hand_landmarks  # 返回21个手部关键点的坐标，其值为比例
+        return hand_point if hand_point else None
 
-        landmark = []
-        # 当关键点存在时
-        if hand_point:
-            for handlms in hand_point:
-                # 绘制关键点及其连接线，参数：
-                # 绘制的图片，关键点坐标，连接线，点样式，线样式
-                self.mp_drawing.draw_landmarks(frame, handlms, self.mp_hands.HAND_CONNECTIONS, self.handMsStyle, self.handConStyle)
-                for i, lm in enumerate(handlms.landmark):
-                    posX = int(lm.x * frame.shape[1])  # lm.x表示在图片大小下的比例，乘以图片大小将其转换为队形坐标
-                    posY = int(lm.y * frame.shape[0])
-                    landmark.append((posX, posY))  # 21个手部关键点坐标
-                    # 显示关键点
-                    cv.putText(frame, str(i), (posX, posY), cv.FONT_HERSHEY_PLAIN, 2, (255, 0, 0), thickness=2)
-
-            return landmark
-        else:
-            raise RuntimeError()
+
+    # 推理输入使用的预分配缓冲区：缩放后的大小变化时取同一块内存的前一部分作为连续数组，只在不够用时扩大
+    def __buffer(self, index, shape):
+        size = shape[0] * shape[1] * shape[2]
+        if self.__buffers[index].size < size:
+            self.__buffers[index] = np.empty(size, np.uint8)
+        return self.__buffers[index][:size].reshape(shape)
+
+
+    # 根据本帧推理耗时调整推理输入的缩放比例：超出预算时缩小，耗时明显低于预算时逐步恢复
+    def __adapt_scale(self, elapsed):
+        if elapsed > self.latency_budget:
+            self.scale = max(self.min_scale, self.scale * 0.8)
+        elif elapsed < self.latency_budget * 0.5:
+            self.scale = min(1.0, self.scale * 1.1)
+
+
+    def draw_landmark(self, frame, landmark):
+        # 绘制关键点连接线、关键点及其编号
+        for start, end in self.mp_hands.HAND_CONNECTIONS:
+            cv.line(frame, (int(landmark[start][0]), int(landmark[start][1])),
+                    (int(landmark[end][0]), int(landmark[end][1])),
+                    self.handConStyle.color, self.handConStyle.thickness)
+        for i in range(len(landmark)):
+            pos = (int(landmark[i][0]), int(landmark[i][1]))
+            cv.circle(frame, pos, self.handMsStyle.circle_radius, self.handMsStyle.color, self.handMsStyle.thickness)
+            cv.putText(frame, str(i), pos, cv.FONT_HERSHEY_PLAIN, 2, (255, 0, 0), thickness=2)
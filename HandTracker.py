@@ -0,0 +1,138 @@
+import numpy as np
+from Command import Command
+
+# 多只手同时出现时由哪一只手控制播放器：
+#   largest：画面中最大的手（通常离摄像头最近），另一只手明显更大（超过 switch_ratio 倍）时才切换；
+#   first_hold：最先把静态手势保持 hold_time 秒的手获得控制权，直到这只手离开画面，
+#               或者它超过 idle_release 秒没有做手势、而另一只手保持了手势
+ARBITRATION_POLICIES = ("largest", "first_hold")
+
+
+# 被跟踪的一只手：跟踪编号、最近一次的关键点，以及这只手自己的时间状态
+# （动态手势识别用的手势中心轨迹、最近识别出的静态手势及其开始时间），多只手之间互不影响
+class TrackedHand:
+    def __init__(self, hand_id, landmark, timestamp):
+        self.id = hand_id
+        self.landmark = np.array(landmark, dtype=np.int32)
+        self.trajectory = None  # TrajectoryEngine，由 GestureRecognizer.track_center 创建
+        self.command = Command.NONE
+        self.command_since = timestamp
+        self.first_seen = timestamp
+        self.update(landmark, timestamp)
+
+    def update(self, landmark, timestamp):
+        self.landmark[...] = landmark
+        self.last_seen = timestamp
+        x_min, y_min = self.landmark.min(axis=0)
+        x_max, y_max = self.landmark.max(axis=0)
+        self.size = int(max(x_max - x_min, y_max - y_min))
+        self.center = (int(self.landmark[9][0]), int(self.landmark[9][1]))
+
+    def set_command(self, command, timestamp):
+        if command != self.command:
+            self.command = command
+            self.command_since = timestamp
+
+    # 当前静态手势已经保持的时间（秒），没有做手势时为 0
+    def held(self, timestamp):
+        return 0.0 if self.command == Command.NONE else timestamp - self.command_since
+
+
+# 多手跟踪：把每帧检测到的手按手势中心的距离与上一帧的手一一对应，保持跟踪编号不变；
+# 短暂丢失（不超过 lost_timeout 秒）的手重新出现时沿用原来的编号和状态。
+# 每帧按 policy 选出控制播放器的手（active），classify(landmark) 用于 first_hold 判断各只手的静态手势
+class HandTracker:
+    def __init__(self, policy="largest", classify=None, max_distance=200, max_speed=3000, lost_timeout=0.5,
+                 hold_time=0.3, idle_release=3.0, switch_ratio=1.2):
+        if policy not in ARBITRATION_POLICIES:
+            raise ValueError(policy, f"Expected one of {ARBITRATION_POLICIES}")
+        self.policy = policy
+        self.classify = classify
+        # 同一只手在相邻两次检测之间最多移动 max_distance 像素（手比该值更大时按手的边长计算），
+        # 再加上 max_speed（像素/秒）乘以间隔时间，推理帧率较低时挥手也不会被当成新出现的手
+        self.max_distance = max_distance
+        self.max_speed = max_speed
+        self.lost_timeout = lost_timeout
+        self.hold_time = hold_time
+        self.idle_release = idle_release
+        self.switch_ratio = switch_ratio
+
+        self.hands = {}  # 跟踪编号 -> TrackedHand，包括暂时丢失、还没有超时的手
+        self.visible = []  # 本帧检测到的手
+        self.active = None  # 控制播放器的手
+        self.__next_id = 0
+
+    # 输入本帧全部手的关键点，返回应当交给手势识别的手：控制权所在的手；
+    # first_hold 下还没有手获得控制权时返回最大的手（只用于显示和推理调度，不会触发命令）；
+    # 控制权所在的手本帧没有被检测到时返回 None
+    def update(self, landmarks, timestamp):
+        self.visible = self.__match(landmarks, timestamp)
+        for hand_id in [hand_id for hand_id, hand in self.hands.items() if timestamp - hand.last_seen > self.lost_timeout]:
+            del self.hands[hand_id]
+        if self.active is not None and self.active.id not in self.hands:
+            self.active = None
+
+        if self.policy == "first_hold" and self.classify is not None:
+            for hand in self.visible:
+                hand.set_command(self.classify(hand.landmark), timestamp)
+        self.__arbitrate(timestamp)
+
+        if self.active is not None:
+            return self.active if self.active in self.visible else None
+        return max(self.visible, key=lambda hand: hand.size) if self.visible else None
+
+    def reset(self):
+        self.hands.clear()
+        self.visible = []
+        self.active = None
+
+    # 贪心匹配：按距离从近到远依次配对，距离过远的检测结果作为新出现的手；
+    # 只跟踪着一只手且只检测到一只手时（单手的情况）直接配对
+    def __match(self, landmarks, timestamp):
+        centers = [(int(landmark[9][0]), int(landmark[9][1])) for landmark in landmarks]
+        pairs = []
+        for hand in self.hands.values():
+            limit = max(self.max_distance, hand.size) + self.max_speed * (timestamp - hand.last_seen)
+            if len(self.hands) == 1 and len(landmarks) == 1:
+                limit = float("inf")
+            for i, (x, y) in enumerate(centers):
+                distance = ((x - hand.center[0]) ** 2 + (y - hand.center[1]) ** 2) ** 0.5
+                if distance <= limit:
+                    pairs.append((distance, hand.id, i))
+        pairs.sort()
+
+        matched = [None] * len(landmarks)
+        used = set()
+        for distance, hand_id, i in pairs:
+            if matched[i] is not None or hand_id in used:
+                continue
+            hand = self.hands[hand_id]
+            hand.update(landmarks[i], timestamp)
+            matched[i] = hand
+            used.add(hand_id)
+
+        for i, landmark in enumerate(landmarks):
+            if matched[i] is None:
+                hand = TrackedHand(self.__next_id, landmark, timestamp)
+                self.__next_id += 1
+                self.hands[hand.id] = hand
+                matched[i] = hand
+        return matched
+
+    def __arbitrate(self, timestamp):
+        if self.policy == "largest":
+            if not self.visible:
+                return
+            largest = max(self.visible, key=lambda hand: hand.size)
+            if (self.active is None or self.active not in self.visible
+                    or largest.size > self.active.size * self.switch_ratio):
+                self.active = largest
+            return
+
+        if self.active is not None:
+            idle = self.active.command == Command.NONE and timestamp - self.active.command_since >= self.idle_release
+            if not idle:
+                return
+        holders = [hand for hand in self.visible if hand is not self.active and hand.held(timestamp) >= self.hold_time]
+        if holders:
+            self.active = min(holders, key=lambda hand: hand.command_since)
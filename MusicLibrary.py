@@ -0,0 +1,198 @@
+import os
+import sqlite3
+import threading
+import mutagen
+from collections import namedtuple
+
+# pygame.mixer.music 能够播放的音频格式
+AUDIO_EXTENSIONS = {".mp3", ".ogg", ".oga", ".opus", ".flac", ".wav", ".mod", ".xm", ".it", ".s3m", ".mid", ".midi"}
+
+# 曲库中的一首歌曲，path 为绝对路径，mtime 为纳秒级修改时间，duration 单位为秒（无法解析时为 None）
+Track = namedtuple("Track", ["path", "mtime", "size", "duration", "title", "artist", "album", "has_cover"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    path TEXT PRIMARY KEY,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    duration REAL,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    has_cover INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def is_audio_file(name):
+    return os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS
+
+
+# 不带扩展名的文件名，作为没有标题标签时的歌曲名
+def file_title(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+# 依次尝试 ID3、Vorbis、MP4 等格式的标签名，返回第一个非空的文本
+def first_tag(tags, *keys):
+    for key in keys:
+        try:
+            value = tags[key]
+        except (KeyError, ValueError, TypeError):
+            continue
+        text = getattr(value, "text", value)
+        if isinstance(text, list):
+            text = text[0] if text else None
+        if text:
+            return str(text)
+    return None
+
+
+# 解析音乐文件的时长、标签和封面，解析失败时只保留文件信息
+def read_track(path, mtime, size):
+    try:
+        audio = mutagen.File(path)
+    except (mutagen.MutagenError, OSError):
+        audio = None
+    if audio is None:
+        return Track(path, mtime, size, None, file_title(path), None, None, False)
+
+    duration = getattr(audio.info, "length", None)
+    tags = audio.tags
+    if tags is None:
+        return Track(path, mtime, size, duration, file_title(path), None, None, False)
+    title = first_tag(tags, "TIT2", "title", "\xa9nam") or file_title(path)
+    artist = first_tag(tags, "TPE1", "artist", "\xa9ART")
+    album = first_tag(tags, "TALB", "album", "\xa9alb")
+    # 与 CoverCache 一致，只有 APIC 标签中的封面会被显示
+    has_cover = "APIC:" in tags
+    return Track(path, mtime, size, duration, title, artist, album, has_cover)
+
+
+# 曲库索引：把歌曲的路径、修改时间、大小、时长、标签和封面信息保存在 SQLite 中。
+# 扫描目录时只对比文件的修改时间和大小，未变化的文件直接使用索引中的信息，
+# 因此打开大型曲库的开销只是遍历目录，不需要重新解析每个文件
+class MusicLibrary:
+    def __init__(self, db_path="music_library.db"):
+        self.db_path = db_path
+        self.__connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.__connection.execute(SCHEMA)
+        self.__connection.commit()
+        self.__lock = threading.Lock()
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+    # 扫描 root 目录，返回按目录遍历顺序（同一目录中按名称排序）排列的歌曲列表
+    def scan(self, root, recursive=True):
+        tracks = []
+        for batch in self.scan_batches(root, recursive):
+            tracks.extend(batch)
+        return tracks
+
+    # 分批扫描，每批最多 batch_size 首歌曲。cancelled 返回 True 时提前结束：
+    # 已经解析的歌曲仍会写入索引，但未遍历到的歌曲不会从索引中移除
+    def scan_batches(self, root, recursive=True, batch_size=256, cancelled=None):
+        root = os.path.abspath(root)
+        indexed = self.__indexed_under(root)
+
+        batch = []
+        changed = []
+        finished = False
+        try:
+            for path, mtime, size in walk_audio_files(root, recursive):
+                if cancelled is not None and cancelled():
+                    break
+                track = indexed.pop(path, None)
+                if track is None or track.mtime != mtime or track.size != size:
+                    track = read_track(path, mtime, size)
+                    changed.append(track)
+                batch.append(track)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            else:
+                finished = True
+            if batch:
+                yield batch
+        finally:
+            self.__update(root, recursive, changed, indexed if finished else {})
+
+    def __update(self, root, recursive, changed, removed):
+        with self.__lock, self.__connection:
+            self.__connection.executemany("INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?, ?)", changed)
+            # 已经删除的文件（或不递归扫描时子目录中的文件）从索引中移除
+            if recursive:
+                self.__connection.executemany("DELETE FROM tracks WHERE path = ?", [(path,) for path in removed])
+            else:
+                self.__connection.executemany("DELETE FROM tracks WHERE path = ?",
+                                              [(path,) for path in removed if os.path.dirname(path) == root])
+
+    # 索引中位于 root 目录下的全部歌曲，利用主键上的范围查询代替前缀匹配
+    def __indexed_under(self, root):
+        prefix = os.path.join(root, "")
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        with self.__lock:
+            rows = self.__connection.execute("SELECT * FROM tracks WHERE path >= ? AND path < ?", (prefix, upper)).fetchall()
+        return {row[0]: Track(*row[:7], bool(row[7])) for row in rows}
+
+
+# 在后台线程中扫描目录，不阻塞界面和播放：每批结果交给 on_batch(tracks)，
+# 结束时调用 on_finished(tracks, cancelled)。回调在扫描线程中执行，界面需要通过信号转交给 GUI 线程
+class LibraryScanner:
+    def __init__(self, library, root, recursive=True, on_batch=None, on_finished=None, batch_size=256):
+        self.library = library
+        self.root = os.path.abspath(root)
+        self.recursive = recursive
+        self.on_batch = on_batch
+        self.on_finished = on_finished
+        self.batch_size = batch_size
+        self.__cancelled = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+
+    def start(self):
+        self.__thread.start()
+
+    def cancel(self):
+        self.__cancelled.set()
+
+    def join(self, timeout=None):
+        self.__thread.join(timeout)
+
+    def is_running(self):
+        return self.__thread.is_alive()
+
+    def __run(self):
+        tracks = []
+        try:
+            for batch in self.library.scan_batches(self.root, self.recursive, self.batch_size, self.__cancelled.is_set):
+                tracks.extend(batch)
+                if self.on_batch is not None:
+                    self.on_batch(batch)
+        except Exception as e:
+            print(e, type(e))
+            self.__cancelled.set()
+        if self.on_finished is not None:
+            self.on_finished(tracks, self.__cancelled.is_set())
+
+
+# 遍历目录中的音频文件，返回 (绝对路径, 修改时间, 大小)；DirEntry 自带的 stat 信息在 Windows 上无需额外系统调用。
+# 同一目录中按名称排序并深度优先遍历，因此分批返回的结果与最终的歌曲列表顺序一致
+def walk_audio_files(root, recursive=True):
+    try:
+        with os.scandir(root) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError as e:
+        print(e, type(e))
+        return
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    yield from walk_audio_files(entry.path, recursive)
+            elif entry.is_file() and is_audio_file(entry.name):
+                stat = entry.stat()
+                yield entry.path, stat.st_mtime_ns, stat.st_size
+        except OSError as e:
+            print(e, type(e))
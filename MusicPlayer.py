@@ -1,127 +1,456 @@
+import io
 import os
 import time
+import queue
 import pygame
-import mutagen
-import pickle
+import functools
 import threading
-from PIL import Image, ImageDraw, ImageFilter
-from PyQt5 import QtCore, QtGui
-from GestureRecognizer import Command
+from concurrent.futures import Future, ThreadPoolExecutor
+from Command import Command
+from MusicLibrary import MusicLibrary, file_title
+from FavoriteStore import FavoriteStore
+from PlayQueue import PlayQueue
 
 
-# 将图片裁剪出一个方形
-def crop_max_square(pil_img):
-    crop_width = min(pil_img.size)
-    crop_height = min(pil_img.size)
-    img_width, img_height = pil_img.size
-    return pil_img.crop(((img_width - crop_width) // 2,
-                         (img_height - crop_height) // 2,
-                         (img_width + crop_width) // 2,
-                         (img_height + crop_height) // 2))
-
-
-# 使用蒙版将图片处理为圆形
-def mask_circle_transparent(pil_img, blur_radius, offset=0):
-    offset = blur_radius * 2 + offset
-    mask = Image.new("L", pil_img.size, 0)
-    draw = ImageDraw.Draw(mask)
-    draw.ellipse((offset, offset, pil_img.size[0] - offset, pil_img.size[1] - offset), fill=255)
-    mask = mask.filter(ImageFilter.GaussianBlur(blur_radius))
-
-    result = pil_img.copy()
-    result.putalpha(mask)
-    return result
+# 修改播放状态的方法都在播放线程中依次执行：其他线程（界面、手势识别）调用时，
+# 方法会被放入命令队列，调用方等待执行结果，因此不会同时修改 music_id、is_pausing 等状态
+def serialized(method):
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        return self.call(method, *args)
+    return wrapper
 
 
 class MusicPlayer:
-    def __init__(self, root_path: str = "."):
-        # 设置播放器音乐文件夹目录
-        if not os.path.exists(root_path):
-            os.mkdir(root_path)
-        self.root_path = os.path.abspath(root_path)
-        self.music_list = os.listdir(self.root_path)
-        self.music_num = len(self.music_list)
-
-        # 加载收藏夹
-        if os.path.exists("favorite.pickle"):
-            with open("favorite.pickle", "rb") as f:
-                self.favorite = pickle.load(f)
-        else:
-            with open("favorite.pickle", "wb") as f:
-                pickle.dump([], f)
-            self.favorite = []
+    # scan 为 False 时只设置根目录、不扫描曲库，由调用方在后台扫描后调用 set_tracks（界面启动时使用）
+    def __init__(self, root_path: str = ".", library: MusicLibrary = None, recursive: bool = True,
+                 favorite: FavoriteStore = None, telemetry=None, scan: bool = True):
+        self.telemetry = telemetry  # Telemetry，可选，记录歌曲加载耗时
+        self.__commands = queue.Queue()
+        self.__thread = threading.Thread(target=self.run, daemon=True)
+        self.__listeners = []
+
+        # 下一首歌曲在后台线程中读入内存，再交给 pygame 排队，播放结束时无缝衔接
+        self.__preloader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preload")
+        self.__preloaded = None  # (路径, 文件内容)
+        self.__queued_path = None  # 已经在 pygame 中排队的歌曲
+        self.__streams = []  # 正在播放和排队的内存文件，需要保持引用
+        # 上一次检查时的 (get_pos, 时间)，排队的歌曲开始播放时 get_pos 会从零重新计时，
+        # 因此实际位置明显落后于按时间推算的位置时说明已经切换到排队的歌曲
+        self.__anchor = (0, 0.0)
+        self.restart_tolerance = 200  # 毫秒
+        # get_pos 只是开始播放以来的时间，不受 set_pos 影响，跳转后用两者之差换算实际播放位置
+        self.__position_offset = 0.0  # 秒
+        self.seek_step = 10  # 快进、快退的秒数
+
+        # 播放队列决定下一首播放哪首歌曲；play_favorites 为 True 时只在收藏列表中的歌曲之间切换
+        self.play_queue = PlayQueue(lambda path: self.__track_ids.get(os.path.abspath(path)))
+        self.play_favorites = False
+        self.__next_path = None  # 播放队列中的下一首，用于预加载
+
+        # 曲库索引，打开目录时只需增量扫描
+        self.library = MusicLibrary() if library is None else library
+        self.recursive = recursive
+        # 加载收藏夹，每次修改都会立即保存
+        if favorite is None:
+            favorite = FavoriteStore()
+            # 旧版本的收藏保存在工作目录下的 favorite.pickle 中，升级后第一次运行时导入
+            favorite.import_pickle("favorite.pickle")
+        self.favorite = favorite
+        self.__load_root_path(root_path, scan)
 
         # 初始化音乐播放器
         pygame.mixer.init()
         self.__music_controller = pygame.mixer.music
-        self.music_id = 0 if len(self.music_list) > 0 else -1
         self.volume = 3  # pygame 的音乐播放器音乐调节范围为 0.0 到 1.0，为避免浮点运算带来的误差，使用整数并除以十传入 set_volume 方法
         self.is_pausing = True
 
-        thread = threading.Thread(target=self.run)
-        thread.setDaemon(True)
-        thread.start()
+        self.__cover_cache = None
+
+        self.__thread.start()
 
 
-    def set_root_path(self, root_path):
+    def set_root_path(self, root_path, scan=True):
+        self.__load_root_path(root_path, scan)
+
+
+    def __load_root_path(self, root_path, scan=True):
         # 设置播放器音乐文件夹目录
         if not os.path.exists(root_path):
             os.mkdir(root_path)
+        self.set_tracks(root_path, self.library.scan(root_path, self.recursive) if scan else [])
+
+
+    # 使用扫描好的歌曲列表替换当前曲库，正在播放的歌曲不受影响；
+    # 新曲库中包含当前歌曲时保持选中，否则从第一首开始
+    @serialized
+    def set_tracks(self, root_path, tracks):
+        current = self.current_path() if hasattr(self, "music_list") else None
         self.root_path = os.path.abspath(root_path)
-        self.music_list = os.listdir(self.root_path)
+        # tracks 保存曲库中的歌曲信息，music_list 为对应的相对路径
+        self.tracks = tracks
+        self.music_list = [os.path.relpath(track.path, self.root_path) for track in tracks]
         self.music_num = len(self.music_list)
-        self.music_id = 0 if len(self.music_list) > 0 else -1
+        self.__track_ids = {track.path: i for i, track in enumerate(tracks)}
+        self.music_id = self.__track_ids.get(current, 0 if len(self.music_list) > 0 else -1)
+        self.__titles = {track.path: track.title for track in tracks}
+        self.__update_source()
+        self.__notify("library")
+
+
+    # 播放范围：整个曲库（range 对象，不复制）或收藏列表中仍在曲库中的歌曲
+    def __update_source(self):
+        if self.play_favorites:
+            ids = [self.__track_ids[path] for path in self.favorite if path in self.__track_ids]
+            self.play_queue.set_source(ids)
+        else:
+            self.play_queue.set_source(range(self.music_num))
+        self.__preload_next()
+
+
+    # 注册播放状态变化的回调 callback(kind)，kind 为 "song"、"state"、"volume"、"favorite"、"position"、"mode"（随机、重复、播放范围）、
+    # "queue" 或 "library"；
+    # 回调在播放线程中执行，界面需要通过信号转交给 GUI 线程
+    def add_listener(self, callback):
+        self.__listeners.append(callback)
+
+
+    # 其他线程可能正在遍历回调列表，替换为新的列表而不是原地删除
+    def remove_listener(self, callback):
+        self.__listeners = [listener for listener in self.__listeners if listener != callback]
+
+
+    def __notify(self, kind):
+        for callback in self.__listeners:
+            callback(kind)
 
 
+    # 歌曲显示名称：优先使用曲库中的标题标签，不在当前曲库中时使用文件名
+    def title_of(self, path):
+        title = self.__titles.get(os.path.abspath(path))
+        return title if title else file_title(path)
+
+
+    # 在播放线程中执行 method 并返回结果；播放线程本身或播放线程未运行时直接执行
+    def call(self, method, *args):
+        if threading.current_thread() is self.__thread or not self.__thread.is_alive():
+            return method(self, *args)
+        return self.submit(method, *args).result()
+
+
+    # 将 method 放入命令队列，返回对应的 Future
+    def submit(self, method, *args):
+        future = Future()
+        self.__commands.put((future, method, args))
+        return future
+
+
+    # 不等待执行结果的版本，用于界面和手势，切歌时不会阻塞调用方
+    def execute_async(self, command):
+        return self.submit(MusicPlayer.execute, command)
+
+
+    def switch_to_async(self, song_id):
+        return self.submit(MusicPlayer.switch_to, song_id)
+
+
+    # 播放线程：依次执行命令队列中的操作；队列为空时一直等待到当前歌曲预计结束的时刻，
+    # 再检查是否已经切换到排队的下一首或需要播放下一首，暂停时不会被唤醒
     def run(self):
         while True:
             try:
-                time.sleep(0.1)
-                if not self.__music_controller.get_busy() and not self.is_pausing:
-                    self.next()
-            except Exception as e:
-                # 由于使用了多线程，可能会在退出程序时出现异常，但不影响程序正常使用
-                print(e)
+                task = self.__commands.get(timeout=self.__time_to_end())
+            except queue.Empty:
+                self.__check_track_end()
+                continue
+            # 先确认是否已经切换到排队的歌曲，再执行命令
+            self.__check_track_end()
+            if task is None:
+                break
+            future, method, args = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(method(self, *args))
+            except BaseException as e:
+                future.set_exception(e)
+            # 命令可能暂停、恢复或重新加载了歌曲
+            self.__anchor = (self.__music_controller.get_pos(), time.perf_counter())
+
+
+    def __check_track_end(self):
+        if self.is_pausing or self.music_id < 0:
+            return
+        try:
+            if not self.__music_controller.get_busy():
+                # 没有排队的歌曲（或排队失败）时重新加载下一首，重复模式为 off 且已经播放完时停止
+                song_id = self.play_queue.advance(self.music_id)
+                if song_id is None:
+                    self.is_pausing = True
+                    self.__notify("state")
+                    return
+                self.music_id = song_id
+                self.play()
+                return
+            position = self.__music_controller.get_pos()
+            now = time.perf_counter()
+            expected = self.__anchor[0] + (now - self.__anchor[1]) * 1000
+            if self.__queued_path is not None and position < expected - self.restart_tolerance:
+                # pygame 已经无缝切换到排队的歌曲。排队之后播放队列可能已经变化（清空队列、切换播放范围、
+                # 重复模式改为 off 等），而 pygame 不能取消排队：下一首不是排队的歌曲时重新加载，没有下一首时停止
+                song_id = self.play_queue.advance(self.music_id)
+                queued_path, self.__queued_path = self.__queued_path, None
+                if song_id is None:
+                    self.__music_controller.stop()
+                    self.__streams = []
+                    self.is_pausing = True
+                    self.__notify("state")
+                    return
+                self.music_id = song_id
+                if os.path.join(self.root_path, self.music_list[song_id]) != queued_path:
+                    self.play()
+                    return
+                self.__position_offset = 0.0
+                del self.__streams[:-1]
+                self.__notify("song")
+                self.__preload_next()
+            self.__anchor = (position, now)
+        except Exception as e:
+            print(e, type(e))
+
+
+    # 距离当前歌曲播放结束的秒数，不需要自动切歌时返回 None
+    def __time_to_end(self, min_wait=0.05, unknown_wait=0.5):
+        if self.is_pausing or self.music_id < 0:
+            return None
+        duration = self.tracks[self.music_id].duration
+        if duration is None:
+            # 曲库中没有时长信息时退回到低频轮询
+            return unknown_wait
+        if self.__music_controller.get_pos() < 0 or not self.__music_controller.get_busy():
+            return min_wait
+        # 在结尾之后 min_wait 内检查是否已经切换到下一首；时长估计偏长时按 min_wait 重新检查
+        return max(duration - self.position(), 0) + min_wait
+
+
+    # 打开歌曲：已经预先读入内存时直接使用内存中的数据
+    def __open(self, path):
+        if self.__preloaded is not None and self.__preloaded[0] == path:
+            return io.BytesIO(self.__preloaded[1])
+        return path
+
+
+    # 播放队列中的下一首歌曲的完整路径，没有下一首时返回 None
+    def __peek_path(self):
+        if self.music_num <= 0 or self.music_id < 0:
+            return None
+        song_id = self.play_queue.peek(self.music_id)
+        return None if song_id is None else os.path.join(self.root_path, self.music_list[song_id])
+
+
+    # 在后台读取下一首歌曲，读取完成后回到播放线程中排队；播放队列变化后也需要调用，
+    # 排队的歌曲会被替换（pygame 只保留最后一次排队的歌曲）
+    def __preload_next(self):
+        path = self.__next_path = self.__peek_path()
+        # 还没有加载过歌曲时不能排队
+        if path is None or not self.__streams:
+            return
+        if self.__preloaded is not None and self.__preloaded[0] == path:
+            self.__enqueue(path, self.__preloaded[1])
+            return
+        try:
+            self.__preloader.submit(self.__read, path)
+        except RuntimeError:
+            # 播放器已经关闭
+            pass
+
 
+    def __read(self, path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            print(e, type(e))
+            return
+        self.submit(MusicPlayer.__enqueue, path, data)
+
+
+    def __enqueue(self, path, data):
+        self.__preloaded = (path, data)
+        # 读取期间可能已经切换了歌曲或修改了播放队列
+        if path != self.__peek_path():
+            return
+        if self.__queued_path == path or not self.__music_controller.get_busy() and not self.is_pausing:
+            return
+        stream = io.BytesIO(data)
+        try:
+            self.__music_controller.queue(stream, os.path.splitext(path)[1][1:])
+        except pygame.error as e:
+            print(e, type(e))
+            return
+        self.__streams.append(stream)
+        self.__queued_path = path
 
+
+    @serialized
     def play(self):
-        self.__music_controller.load(os.path.join(self.root_path, self.music_list[self.music_id]))
+        start = time.perf_counter_ns()
+        path = os.path.join(self.root_path, self.music_list[self.music_id])
+        stream = self.__open(path)
+        if isinstance(stream, io.BytesIO):
+            self.__music_controller.load(stream, os.path.splitext(path)[1][1:])
+        else:
+            self.__music_controller.load(stream)
         self.__music_controller.play()
+        if self.telemetry is not None:
+            self.telemetry.record_ns("track_load", time.perf_counter_ns() - start)
+        self.__streams = [stream]
+        self.__queued_path = None
+        self.__position_offset = 0.0
+        self.__anchor = (0, time.perf_counter())
         self.is_pausing = False
+        self.__notify("song")
+        self.__preload_next()
 
 
     def close(self):
+        self.call(MusicPlayer.__close)
+        if self.__thread.is_alive():
+            self.__commands.put(None)
+            # EXIT 命令在播放线程中调用 close，此时不能等待自身结束
+            if threading.current_thread() is not self.__thread:
+                self.__thread.join(1)
+
+
+    def __close(self):
+        self.is_pausing = True
+        self.__preloader.shutdown(wait=False, cancel_futures=True)
         self.__music_controller.fadeout(2)
         self.__music_controller.stop()
-        with open("favorite.pickle", "wb") as f:
-            pickle.dump(self.favorite, f)
+        self.favorite.close()
 
 
+    # 手动切换到下一首：忽略单曲循环和重复模式 off，随机播放时按本轮的随机顺序
+    @serialized
     def next(self):
-        self.music_id = (self.music_id + 1) % self.music_num
+        song_id = self.play_queue.advance(self.music_id, manual=True)
+        if song_id is None:
+            return
+        self.music_id = song_id
         self.play()
 
 
+    @serialized
     def previous(self):
-        self.music_id = ((self.music_id - 1) + self.music_num) % self.music_num
+        song_id = self.play_queue.back(self.music_id)
+        if song_id is None:
+            return
+        self.music_id = song_id
         self.play()
 
 
+    @serialized
     def switch_to(self, song_id):
+        self.play_queue.remember(self.music_id)
         self.music_id = song_id % self.music_num
         self.play()
 
 
+    # 把歌曲加入播放队列，当前歌曲结束或手动切换下一首时按加入的顺序播放
+    @serialized
+    def enqueue(self, path):
+        self.play_queue.enqueue(path)
+        self.__notify("queue")
+        self.__preload_next()
+
+
+    def enqueue_async(self, path):
+        return self.submit(MusicPlayer.enqueue, path)
+
+
+    @serialized
+    def clear_queue(self):
+        self.play_queue.clear()
+        self.__notify("queue")
+        self.__preload_next()
+
+
+    # 开关随机播放，开启后每一轮播放完范围内的全部歌曲之前不会重复
+    @serialized
+    def toggle_shuffle(self):
+        self.play_queue.set_shuffle(not self.play_queue.shuffle)
+        self.__notify("mode")
+        self.__preload_next()
+
+
+    # 依次切换重复模式 all -> one -> off，返回切换后的模式
+    @serialized
+    def cycle_repeat(self):
+        repeat = self.play_queue.cycle_repeat()
+        self.__notify("mode")
+        self.__preload_next()
+        return repeat
+
+
+    # 在整个曲库与收藏列表之间切换播放范围，当前歌曲继续播放，之后的歌曲从新的范围中选择
+    @serialized
+    def toggle_play_favorites(self):
+        self.play_favorites = not self.play_favorites
+        self.__update_source()
+        self.__notify("mode")
+
+
+    # 从收藏列表中的某一首开始播放，之后只播放收藏的歌曲
+    @serialized
+    def play_favorite(self, path):
+        song_id = self.__track_ids.get(os.path.abspath(path))
+        if song_id is None:
+            print("歌曲不在当前曲库中：", path)
+            return
+        if not self.play_favorites:
+            self.play_favorites = True
+            self.__update_source()
+            self.__notify("mode")
+        self.switch_to(song_id)
+
+
+    def play_favorite_async(self, path):
+        return self.submit(MusicPlayer.play_favorite, path)
+
+
+    # 当前歌曲的播放位置（秒），还没有开始播放时为 0
+    def position(self):
+        position = self.__music_controller.get_pos()
+        return 0.0 if position < 0 else self.__position_offset + position / 1000
+
+
+    # 跳转到当前歌曲的 seconds 秒处，超出时长时停在结尾前；还没有开始播放时先开始播放
+    @serialized
+    def set_pos(self, seconds):
+        if self.music_id < 0:
+            return
+        if self.__music_controller.get_pos() < 0:
+            self.play()
+        duration = self.tracks[self.music_id].duration
+        seconds = max(0.0, seconds if duration is None else min(seconds, duration - 0.5))
+        try:
+            self.__music_controller.set_pos(seconds)
+        except pygame.error as e:
+            print(e, type(e))
+            return
+        self.__position_offset = seconds - self.__music_controller.get_pos() / 1000
+
+
     def get_busy(self):
         return self.__music_controller.get_busy()
 
 
+    @serialized
     def like_current_song(self):
         current_song = os.path.join(self.root_path, self.music_list[self.music_id])
-        if current_song not in self.favorite:
-            self.favorite.append(current_song)
-        else:
-            self.favorite.remove(current_song)
+        self.favorite.toggle(current_song)
+        if self.play_favorites:
+            self.__update_source()
 
 
     def is_current_in_favorite(self):
@@ -131,38 +460,43 @@ class MusicPlayer:
         return current_song in self.favorite
 
 
+    # 当前歌曲的完整路径，根目录为空时返回 None
+    def current_path(self):
+        if not 0 <= self.music_id < len(self.music_list):
+            return None
+        return os.path.join(self.root_path, self.music_list[self.music_id])
+
+
+    # 接下来可能播放的歌曲：播放队列中的下一首、上一曲以及收藏列表中的歌曲，用于预先加载封面
+    def neighbour_paths(self, favorites=8):
+        if self.music_num <= 0 or self.music_id < 0:
+            return []
+        paths = [os.path.join(self.root_path, self.music_list[(self.music_id - 1) % self.music_num])]
+        if self.__next_path is not None:
+            paths.insert(0, self.__next_path)
+        return paths + self.favorite.head(favorites)
+
+
+    # 封面缓存，重复播放时直接使用处理好的封面。封面以 QImage 保存，
+    # 因此在第一次使用时才导入 PyQt5，无界面运行时不会加载
+    @property
+    def cover_cache(self):
+        if self.__cover_cache is None:
+            from CoverCache import CoverCache
+            self.__cover_cache = CoverCache()
+        return self.__cover_cache
+
+
     def get_current_cover(self):
-        try:
-            # 歌曲文件可能缺失 APIC 标签(KeyError)或全部标签(TypeError, 因为对不存在的 tags 进行了索引)
-            audio = mutagen.File(os.path.join(self.root_path, self.music_list[self.music_id]))
-            cover_data = audio.tags['APIC:'].data
-
-            cover_path = "./pictures/origin_cover.png"
-            with open(cover_path, "wb") as img:
-                img.write(cover_data)
-
-            # 将图片处理为适合作封面的图
-            mark_img = Image.open(cover_path)
-            trumb_width = 600
-
-            im_square = crop_max_square(mark_img).resize((trumb_width, trumb_width), Image.LANCZOS)
-            im_thumb = mask_circle_transparent(im_square, 0)
-            im_thumb.save(cover_path)
-
-            pix_img = QtGui.QPixmap(cover_path)
-            pix = pix_img.scaled(300, 300, QtCore.Qt.KeepAspectRatio)
-            os.remove(cover_path)
-            return pix
-        except (KeyError, TypeError) as e:
-            print(e, type(e))
-            pix_img = QtGui.QPixmap('./pictures/default_cover.png')
-            pix = pix_img.scaled(300, 300, QtCore.Qt.KeepAspectRatio)
-            return pix
-        except IndexError:
+        from PyQt5 import QtGui
+        if not 0 <= self.music_id < len(self.music_list):
             print("根目录为空")
             return None
+        image = self.cover_cache.get(os.path.join(self.root_path, self.music_list[self.music_id]))
+        return QtGui.QPixmap.fromImage(image)
 
 
+    @serialized
     def execute(self, command: Command) -> int | Command:
         match command:
             case Command.TOGGLE:
@@ -174,6 +508,7 @@ class MusicPlayer:
                 else:
                     self.__music_controller.unpause()
                     self.is_pausing = False
+                self.__notify("state")
             case Command.NEXT:
                 self.next()
             case Command.PREVIOUS:
@@ -182,12 +517,32 @@ class MusicPlayer:
                 if self.volume < 10:
                     self.volume += 1
                     self.__music_controller.set_volume(self.volume / 10)
+                    self.__notify("volume")
             case Command.VOLUME_DOWN:
                 if self.volume > 0:
                     self.volume -= 1
                     self.__music_controller.set_volume(self.volume / 10)
+                    self.__notify("volume")
             case Command.TOGGLE_FAVORITE:
                 self.like_current_song()
+                self.__notify("favorite")
+            case Command.SEEK_FORWARD:
+                self.set_pos(self.position() + self.seek_step)
+                self.__notify("position")
+            case Command.SEEK_BACKWARD:
+                self.set_pos(self.position() - self.seek_step)
+                self.__notify("position")
+            case Command.SHUFFLE:
+                self.toggle_shuffle()
+            case Command.REPEAT:
+                self.cycle_repeat()
+            case Command.PLAY_FAVORITES:
+                self.toggle_play_favorites()
+            case Command.CLEAR_QUEUE:
+                self.clear_queue()
+            case Command.RESTART:
+                self.set_pos(0)
+                self.__notify("position")
             case Command.EXIT:
                 self.close()
             case Command.NONE:
@@ -0,0 +1,163 @@
+import random
+from collections import deque
+
+
+# 惰性随机排列（Fisher–Yates 洗牌的惰性版本）：不复制、不打乱整个列表，
+# 只用 dict 记录被交换过的位置，第 k 次抽取是 O(1)，一轮中已经抽取 k 首时只占用 O(k) 的内存。
+# 一轮抽完全部 size 个位置之前不会重复
+class LazyShuffle:
+    def __init__(self, size, rng=None):
+        self.size = size
+        self.rng = random.Random() if rng is None else rng
+        self.__swaps = {}  # 位置 -> 交换到该位置的值，没有记录的位置上是它自己
+        self.__drawn = 0
+
+    def __value(self, i):
+        return self.__swaps.get(i, i)
+
+    def __swap(self, i, j):
+        self.__swaps[i], self.__swaps[j] = self.__value(j), self.__value(i)
+
+    def remaining(self):
+        return self.size - self.__drawn
+
+    # 把 value 当作本轮已经抽到的第一个，用于排除正在播放的歌曲；一轮已经开始抽取时不起作用
+    def skip(self, value):
+        if self.__drawn == 0 and value is not None and 0 <= value < self.size:
+            self.__swap(0, value)
+            self.__drawn = 1
+
+    # 抽取下一个位置，本轮抽完时返回 None
+    def draw(self):
+        if self.__drawn >= self.size:
+            return None
+        i = self.__drawn
+        self.__swap(i, self.rng.randrange(i, self.size))
+        self.__drawn += 1
+        return self.__value(i)
+
+
+# 播放队列：决定当前歌曲之后播放哪一首，歌曲用曲库中的编号（music_id）表示。
+# - 手动加入的歌曲保存在 deque 中，加入和取出都是 O(1)，优先于播放顺序中的下一首；
+# - 播放范围（source）为整个曲库或收藏列表中的歌曲，按顺序或随机播放，随机播放用 LazyShuffle，
+#   每轮播放完范围内的全部歌曲之前不会重复，大曲库开启随机播放也不需要 O(n) 的洗牌；
+# - 重复模式：all 播放完后从头开始（随机播放时开始新的一轮），one 单曲循环，off 播放完后停止。
+#   单曲循环和 off 只影响歌曲自然结束时的切换，手动切歌（manual=True）总是切换到下一首
+class PlayQueue:
+    REPEAT_MODES = ("all", "one", "off")
+
+    # resolve(path) 返回歌曲路径在曲库中的编号，不在曲库中时返回 None
+    def __init__(self, resolve, history_size=256, seed=None):
+        self.resolve = resolve
+        self.rng = random.Random(seed)
+        self.up_next = deque()  # 手动加入的歌曲路径
+        self.history = deque(maxlen=history_size)  # 随机播放时播放过的歌曲，用于上一首
+        self.repeat = "all"
+        self.shuffle = False
+        self.set_source(range(0))
+
+    # 设置播放范围：曲库编号组成的序列，整个曲库时传入 range 对象，不会复制
+    def set_source(self, ids):
+        self.source = ids
+        self.__positions = None if isinstance(ids, range) else {song_id: i for i, song_id in enumerate(ids)}
+        self.__restart_cycle()
+
+    def set_shuffle(self, shuffle):
+        self.shuffle = shuffle
+        self.history.clear()
+        self.__restart_cycle()
+
+    def cycle_repeat(self):
+        self.repeat = self.REPEAT_MODES[(self.REPEAT_MODES.index(self.repeat) + 1) % len(self.REPEAT_MODES)]
+        return self.repeat
+
+    def enqueue(self, path):
+        self.up_next.append(path)
+
+    def clear(self):
+        self.up_next.clear()
+
+    def __len__(self):
+        return len(self.up_next)
+
+    # current 在播放范围中的位置，不在范围中时返回 None
+    def __position(self, current):
+        if self.__positions is not None:
+            return self.__positions.get(current)
+        return current if current is not None and 0 <= current < len(self.source) else None
+
+    def __restart_cycle(self):
+        self.__shuffle = LazyShuffle(len(self.source), self.rng)
+        self.__upcoming = None  # 已经抽取、还没有开始播放的下一首（预加载时需要提前确定）
+
+    # 队列中第一首仍在曲库中的手动加入的歌曲，已经不在曲库中的歌曲直接丢弃
+    def __first_queued(self):
+        while self.up_next:
+            song_id = self.resolve(self.up_next[0])
+            if song_id is not None:
+                return song_id
+            self.up_next.popleft()
+        return None
+
+    def __next_in_order(self, current, manual):
+        if len(self.source) == 0:
+            return None
+        if self.shuffle:
+            if self.__upcoming is None:
+                # 每轮开始时正在播放的歌曲算作本轮已经播放过，新的一轮不会紧接着重复上一首
+                self.__shuffle.skip(self.__position(current))
+                position = self.__shuffle.draw()
+                if position is None:
+                    if self.repeat == "off" and not manual:
+                        return None
+                    self.__restart_cycle()
+                    self.__shuffle.skip(self.__position(current))
+                    position = self.__shuffle.draw()
+                    if position is None:
+                        # 播放范围只有正在播放的这一首
+                        position = self.__position(current)
+                self.__upcoming = position
+            return self.source[self.__upcoming]
+        position = self.__position(current)
+        position = 0 if position is None else position + 1
+        if position >= len(self.source):
+            if self.repeat == "off" and not manual:
+                return None
+            position = 0
+        return self.source[position]
+
+    # 当前歌曲之后将要播放的歌曲，不改变队列状态（随机播放时抽取的结果会保留给 advance），没有时返回 None
+    def peek(self, current, manual=False):
+        if not manual and self.repeat == "one" and current is not None and current >= 0:
+            return current
+        song_id = self.__first_queued()
+        if song_id is not None:
+            return song_id
+        return self.__next_in_order(current, manual)
+
+    # 切换到下一首并返回其编号，没有下一首时返回 None
+    def advance(self, current, manual=False):
+        song_id = self.peek(current, manual)
+        if song_id is None or song_id == current and not manual and self.repeat == "one":
+            return song_id
+        if self.up_next and self.resolve(self.up_next[0]) == song_id:
+            self.up_next.popleft()
+        else:
+            self.__upcoming = None
+        self.remember(current)
+        return song_id
+
+    # 记录切换前正在播放的歌曲，随机播放时上一首按播放过的顺序返回
+    def remember(self, current):
+        if current is not None and current >= 0:
+            self.history.append(current)
+
+    # 上一首：随机播放时返回上一首播放过的歌曲，否则返回播放范围中的前一首
+    def back(self, current):
+        if self.shuffle and self.history:
+            return self.history.pop()
+        if len(self.source) == 0:
+            return None
+        position = self.__position(current)
+        position = 0 if position is None else position - 1
+        return self.source[position % len(self.source)]
@@ -0,0 +1,141 @@
+import os
+import bisect
+from PyQt5 import QtCore
+
+
+# 歌曲列表模型：只保存路径和标题两个列表，视图只为可见的行创建绘制数据。
+# 行数按 batch_size 分批交给视图（canFetchMore/fetchMore），滚动到末尾时再继续加载；
+# 搜索时在小写标题上做子串匹配，只保存匹配到的歌曲序号
+class SongListModel(QtCore.QAbstractListModel):
+    def __init__(self, batch_size=1000, parent=None):
+        super(SongListModel, self).__init__(parent)
+        self.batch_size = batch_size
+        self.__paths = []
+        self.__titles = []
+        self.__keys = None  # 小写标题，第一次搜索时生成
+        self.__pattern = ""
+        self.__rows = None  # 过滤后每一行对应的歌曲序号，没有过滤时为 None
+        self.__loaded = 0  # 已经交给视图的行数
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self.__loaded
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self.__loaded < self.__visible_count()
+
+    def fetchMore(self, parent):
+        count = min(self.batch_size, self.__visible_count() - self.__loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), self.__loaded, self.__loaded + count - 1)
+        self.__loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.__loaded:
+            return None
+        song = self.song_index(index.row())
+        if role == QtCore.Qt.DisplayRole:
+            return self.__titles[song]
+        if role == QtCore.Qt.ToolTipRole:
+            return self.__paths[song]
+        return None
+
+    # 替换全部歌曲
+    def set_songs(self, paths, titles):
+        self.beginResetModel()
+        self.__paths = list(paths)
+        self.__titles = list(titles)
+        self.__keys = None
+        self.__rows = self.__match(0) if self.__pattern else None
+        self.__loaded = min(self.batch_size, self.__visible_count())
+        self.endResetModel()
+
+    # 在末尾追加歌曲，已经显示的行不需要重新绘制
+    def append_songs(self, paths, titles):
+        start = len(self.__paths)
+        self.__paths.extend(paths)
+        self.__titles.extend(titles)
+        if self.__keys is not None:
+            self.__keys.extend(title.lower() for title in titles)
+        if self.__rows is not None:
+            self.__rows.extend(self.__match(start))
+        # 视图还没有填满时直接显示新加入的行，否则等滚动到末尾时再加载
+        if self.__loaded < self.batch_size:
+            self.fetchMore(QtCore.QModelIndex())
+
+    def remove_song(self, path):
+        try:
+            song = self.__paths.index(path)
+        except ValueError:
+            return
+        row = self.row_of(song)
+        if row is not None and row < self.__loaded:
+            self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self.__paths[song]
+        del self.__titles[song]
+        if self.__keys is not None:
+            del self.__keys[song]
+        if self.__rows is not None:
+            self.__rows = [i if i < song else i - 1 for i in self.__rows if i != song]
+        if row is not None and row < self.__loaded:
+            self.__loaded -= 1
+            self.endRemoveRows()
+
+    # 根据新的路径列表增量更新：找出与当前列表相同的首尾部分，只删除和插入中间变化的歌曲
+    def sync(self, paths, title_of):
+        paths = list(paths)
+        head = len(os.path.commonprefix([self.__paths, paths]))
+        tail = len(os.path.commonprefix([self.__paths[head:][::-1], paths[head:][::-1]]))
+        for path in self.__paths[head:len(self.__paths) - tail]:
+            self.remove_song(path)
+        inserted = paths[head:len(paths) - tail]
+        if not inserted:
+            return
+        if tail == 0:
+            self.append_songs(inserted, [title_of(path) for path in inserted])
+        else:
+            # 收藏列表只会在末尾追加，其他位置的插入直接重置
+            self.set_songs(paths, [title_of(path) for path in paths])
+
+    def set_filter(self, pattern):
+        pattern = pattern.strip().lower()
+        if pattern == self.__pattern:
+            return
+        self.beginResetModel()
+        self.__pattern = pattern
+        self.__rows = self.__match(0) if pattern else None
+        self.__loaded = min(self.batch_size, self.__visible_count())
+        self.endResetModel()
+
+    # 行号对应的歌曲序号
+    def song_index(self, row):
+        return row if self.__rows is None else self.__rows[row]
+
+    # 歌曲序号对应的行号，被过滤掉时返回 None
+    def row_of(self, song):
+        if self.__rows is None:
+            return song if 0 <= song < len(self.__paths) else None
+        # 过滤结果按歌曲序号递增排列
+        row = bisect.bisect_left(self.__rows, song)
+        return row if row < len(self.__rows) and self.__rows[row] == song else None
+
+    # 把行数加载到包含 row 为止，用于定位到当前歌曲
+    def ensure_loaded(self, row):
+        if row >= self.__loaded and row < self.__visible_count():
+            self.beginInsertRows(QtCore.QModelIndex(), self.__loaded, row)
+            self.__loaded = row + 1
+            self.endInsertRows()
+
+    def path(self, row):
+        return self.__paths[self.song_index(row)]
+
+    def __visible_count(self):
+        return len(self.__paths) if self.__rows is None else len(self.__rows)
+
+    def __match(self, start):
+        if self.__keys is None:
+            self.__keys = [title.lower() for title in self.__titles]
+            start = 0
+        pattern = self.__pattern
+        return [i for i in range(start, len(self.__keys)) if pattern in self.__keys[i]]
@@ -1,21 +1,28 @@
-import os
 import qtawesome
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 from PyQt5 import QtCore
 from PyQt5.QtCore import Qt
 
-from GestureRecognizer import Command
+from Command import Command
+from CoverCache import CoverLoader
+from MusicLibrary import LibraryScanner
+from SongListModel import SongListModel
 
 
 # 歌单窗格
 class ListPane(QFrame):
     song_switch = QtCore.pyqtSignal()
+    # 扫描线程中的回调通过信号转交给 GUI 线程
+    scan_batch = QtCore.pyqtSignal(object)
+    scan_finished = QtCore.pyqtSignal(object, bool)
 
-    def __init__(self, player, recognizer):
+    # gesture_functions 为手势识别器的手势注册表，识别器在后台加载完成后也可以通过 set_gesture_functions 设置
+    def __init__(self, player, gesture_functions=()):
         super(ListPane, self).__init__()
         self.player = player
-        self.gesture_functions = recognizer.gesture_functions
+        self.scanner = None  # 正在进行的目录扫描
+        self.scanned_count = 0
 
         self.listpane_layout = QVBoxLayout()
         self.setLayout(self.listpane_layout)
@@ -36,80 +43,176 @@ class ListPane(QFrame):
         self.favorite_list_button.clicked.connect(lambda: self.music_widget.setCurrentIndex(1))
         self.button_layout.addWidget(self.favorite_list_button)
 
-        self.music_list = QListWidget()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索歌曲")
+        self.search_edit.textChanged.connect(self.filter_songs)
+        self.listpane_layout.insertWidget(1, self.search_edit)
+
+        # 列表使用模型/视图结构，只有可见的行才会被绘制
+        self.music_model = SongListModel()
+        self.music_list = QListView()
+        self.music_list.setUniformItemSizes(True)
+        self.music_list.setModel(self.music_model)
         self.music_list.doubleClicked.connect(self.switch_song)
-        for i in range(0, len(self.player.music_list)):
-            song = ".".join(self.player.music_list[i].split(".")[:-1])
-            item = QListWidgetItem(self.music_list)
-            item.setText(song)
+        self.music_list.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.music_list.customContextMenuRequested.connect(self.show_song_menu)
+        self.fill_music_list(self.player.tracks)
         self.update_current_song()
         self.music_widget.addWidget(self.music_list)
 
-        self.favorite_list = QListWidget()
+        self.favorite_model = SongListModel()
+        self.favorite_list = QListView()
+        self.favorite_list.setUniformItemSizes(True)
+        self.favorite_list.setModel(self.favorite_model)
+        self.favorite_list.doubleClicked.connect(self.play_favorite)
         self.update_favorite()
         self.music_widget.addWidget(self.favorite_list)
 
         self.info_list = QTableWidget()
         self.info_list.setColumnCount(2)
         self.info_list.setColumnWidth(0, 80)
-        self.info_list.setRowCount(len(self.gesture_functions))
         self.info_list.setHorizontalHeaderLabels(['手势', '功能'])
-        for i in range(0, len(self.gesture_functions)):
-            self.info_list.setItem(i, 0, QTableWidgetItem(self.gesture_functions[i]['gesture']))
-            self.info_list.setItem(i, 1, QTableWidgetItem(self.gesture_functions[i]['function']))
+        self.set_gesture_functions(gesture_functions)
         self.listpane_layout.addWidget(self.info_list)
 
+        self.scan_label = QLabel()
+        self.scan_label.hide()
+        self.listpane_layout.addWidget(self.scan_label)
+
         self.set_rootpath_button = QPushButton()
         self.set_rootpath_button.setText("切换音乐目录")
         self.set_rootpath_button.clicked.connect(self.set_root_path)
         self.listpane_layout.addWidget(self.set_rootpath_button)
 
+        self.scan_batch.connect(self.append_tracks)
+        self.scan_finished.connect(self.finish_scan)
+
+
+    def set_gesture_functions(self, gesture_functions):
+        self.gesture_functions = gesture_functions
+        self.info_list.setRowCount(len(gesture_functions))
+        for i in range(0, len(gesture_functions)):
+            self.info_list.setItem(i, 0, QTableWidgetItem(gesture_functions[i]['gesture']))
+            self.info_list.setItem(i, 1, QTableWidgetItem(gesture_functions[i]['function']))
 
+
+    # 选择新的音乐目录并扫描；扫描期间再次点击按钮可以取消
     def set_root_path(self):
+        if self.scanner is not None:
+            self.scanner.cancel()
+            self.set_rootpath_button.setEnabled(False)
+            return
         root_path = QFileDialog.getExistingDirectory(self, '选择文件夹', './')
         if root_path:
-            self.player.set_root_path(root_path)
-            self.music_list.clear()
-            for i in range(0, len(self.player.music_list)):
-                song = ".".join(self.player.music_list[i].split(".")[:-1])
-                item = QListWidgetItem(self.music_list)
-                item.setText(song)
-            self.update_current_song()
-            self.repaint()
-
-
-    def switch_song(self):
-        item = QListWidgetItem(self.music_list.currentItem())
-        print(item.text())
-        song_id = self.music_list.currentRow()
-        self.player.switch_to(song_id)
+            self.scan(root_path)
+
+
+    # 在后台线程中扫描目录，扫描结果分批显示，扫描完成后才替换播放器中的曲库
+    def scan(self, root_path):
+        self.scanner = LibraryScanner(self.player.library, root_path, self.player.recursive,
+                                      on_batch=self.scan_batch.emit, on_finished=self.scan_finished.emit)
+        self.scanned_count = 0
+        self.music_model.set_songs([], [])
+        self.scan_label.setText("正在扫描...")
+        self.scan_label.show()
+        self.set_rootpath_button.setText("取消扫描")
+        self.scanner.start()
+
+
+    def fill_music_list(self, tracks):
+        self.music_model.set_songs([track.path for track in tracks], [track.title for track in tracks])
+
+
+    def append_tracks(self, tracks):
+        self.music_model.append_songs([track.path for track in tracks], [track.title for track in tracks])
+        self.scanned_count += len(tracks)
+        self.scan_label.setText(f"正在扫描，已找到 {self.scanned_count} 首歌曲")
+
+
+    def finish_scan(self, tracks, cancelled):
+        if cancelled:
+            # 取消扫描时保留原来的曲库
+            self.fill_music_list(self.player.tracks)
+        else:
+            self.player.set_tracks(self.scanner.root, tracks)
+        self.scanner = None
+        self.scan_label.hide()
+        self.set_rootpath_button.setText("切换音乐目录")
+        self.set_rootpath_button.setEnabled(True)
+        self.update_current_song()
         self.song_switch.emit()
 
 
+    def switch_song(self, index):
+        # 扫描期间列表与播放器中的曲库不一致
+        if self.scanner is not None:
+            return
+        print(self.music_model.data(index))
+        # 切歌在播放线程中完成，完成后由 ControlPane 收到状态变化通知并更新界面
+        self.player.switch_to_async(self.music_model.song_index(index.row()))
+
+
+    # 右键菜单：把选中的歌曲加入播放队列
+    def show_song_menu(self, position):
+        index = self.music_list.indexAt(position)
+        if not index.isValid() or self.scanner is not None:
+            return
+        menu = QMenu(self)
+        enqueue_action = menu.addAction("加入播放队列")
+        clear_action = menu.addAction("清空播放队列")
+        action = menu.exec_(self.music_list.viewport().mapToGlobal(position))
+        if action is enqueue_action:
+            self.player.enqueue_async(self.music_model.path(index.row()))
+        elif action is clear_action:
+            self.player.execute_async(Command.CLEAR_QUEUE)
+
+
+    # 双击收藏列表中的歌曲时从这首开始只播放收藏的歌曲
+    def play_favorite(self, index):
+        if self.scanner is not None:
+            return
+        self.player.play_favorite_async(self.favorite_model.path(index.row()))
+
+
+    def filter_songs(self, text):
+        self.music_model.set_filter(text)
+        self.favorite_model.set_filter(text)
+        self.update_current_song()
+
+
     def update_current_song(self):
-        self.music_list.setCurrentRow(self.player.music_id)
+        if self.scanner is not None:
+            return
+        row = self.music_model.row_of(self.player.music_id)
+        if row is None:
+            self.music_list.clearSelection()
+            return
+        self.music_model.ensure_loaded(row)
+        index = self.music_model.index(row)
+        self.music_list.setCurrentIndex(index)
+        self.music_list.scrollTo(index)
 
 
+    # 收藏一次只会增加或删除一首歌曲，只通知视图变化的行
     def update_favorite(self):
-        self.favorite_list.clear()
-        for i in range(0, len(self.player.favorite)):
-            path = self.player.favorite[i]
-            filename = os.path.basename(path)
-            song = ".".join(filename.split(".")[:-1])
-            item = QListWidgetItem(self.favorite_list)
-            item.setText(song)
+        self.favorite_model.sync(self.player.favorite, self.player.title_of)
 
 
 # 用于显示摄像头画面和其他歌曲信息的主窗格
 class MainPane(QFrame):
-    def __init__(self, player, recognizer):
+    def __init__(self, player, telemetry=None, overlay=False):
         super(MainPane, self).__init__()
         self.player = player
+        self.telemetry = telemetry
 
         self.layout = QGridLayout()
         self.layout.setAlignment(Qt.AlignTop | Qt.AlignLeft)
         self.setLayout(self.layout)
 
+        # 封面在后台线程中加载，加载完成后通过信号更新，不阻塞界面和摄像头画面
+        self.cover_loader = CoverLoader(self.player.cover_cache, telemetry=telemetry)
+        self.cover_loader.cover_ready.connect(self.show_cover)
+
         self.cover_label = QLabel()
         self.update_cover()
         self.layout.addWidget(self.cover_label, 0, 0, 2, 2)
@@ -117,26 +220,65 @@ class MainPane(QFrame):
         self.camera_label = QLabel()
         self.layout.addWidget(self.camera_label, 3, 0, 6, 8)
 
+        # 可选的性能统计浮层，每秒刷新一次
+        self.telemetry_label = QLabel()
+        self.telemetry_label.setFont(QFont("Consolas", 9))
+        self.telemetry_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        self.layout.addWidget(self.telemetry_label, 0, 2, 2, 6)
+        self.telemetry_timer = QtCore.QTimer(self)
+        self.telemetry_timer.timeout.connect(self.update_telemetry)
+        if overlay and telemetry is not None:
+            self.telemetry_timer.start(1000)
+        else:
+            self.telemetry_label.hide()
+
+
+    def update_telemetry(self):
+        fps = self.telemetry.fps()
+        lines = ["FPS: -" if fps is None else f"FPS: {fps:.1f}"]
+        for stage, (count, p50, p95, p99, peak) in self.telemetry.summary().items():
+            if stage != "frame":
+                lines.append(f"{stage:<18} p50 {p50:6.1f}  p95 {p95:6.1f}  p99 {p99:6.1f} ms")
+        self.telemetry_label.setText("\n".join(lines))
+
+
     def update_cover(self):
-        cover = self.player.get_current_cover()
-        if cover:
-            self.cover_label.setPixmap(cover)
+        path = self.player.current_path()
+        if path is None:
+            return
+        image = self.player.cover_cache.peek(path)
+        if image is not None:
+            self.cover_label.setPixmap(QPixmap.fromImage(image))
+        else:
+            self.cover_loader.request(path)
+        self.cover_loader.prefetch(self.player.neighbour_paths())
+
 
+    def show_cover(self, path, image):
+        # 加载期间可能已经切换了歌曲，只显示当前歌曲的封面
+        if path == self.player.current_path():
+            self.cover_label.setPixmap(QPixmap.fromImage(image))
 
+
+    # 在 GUI 线程中调用，QPixmap.fromImage 会复制画面，之后 image 的缓冲区即可被复用
     def update_camera_image(self, image):
         self.camera_label.setPixmap(QPixmap.fromImage(image))
-        self.camera_label.resize(image.size())
-        self.camera_label.show()
+        if self.camera_label.size() != image.size():
+            self.camera_label.resize(image.size())
 
 
 # 设置窗格，用于放置各功能按钮
 class ControlPane(QFrame):
     new_favorite = QtCore.pyqtSignal()
     new_song = QtCore.pyqtSignal()
+    # 播放线程中的状态变化通知通过信号转交给 GUI 线程
+    player_changed = QtCore.pyqtSignal(str)
 
     def __init__(self, player):
         super(ControlPane, self).__init__()
         self.player = player
+        self.player_changed.connect(self.on_player_changed)
+        self.player.add_listener(self.player_changed.emit)
 
         self.controlpane_layout = QGridLayout()
         self.controlpane_layout.setColumnStretch(10, 0)
@@ -172,12 +314,44 @@ class ControlPane(QFrame):
         self.like_button.clicked.connect(self.mark_like)
         self.controlpane_layout.addWidget(self.like_button, 0, 8, 1, 1)
 
+        self.shuffle_button = QPushButton(qtawesome.icon('fa.random', color="#3FC89C"), "")
+        self.shuffle_button.clicked.connect(lambda: self.player.execute_async(Command.SHUFFLE))
+        self.controlpane_layout.addWidget(self.shuffle_button, 0, 6, 1, 1)
+
+        self.repeat_button = QPushButton(qtawesome.icon('fa.repeat', color="#3FC89C"), "")
+        self.repeat_button.clicked.connect(lambda: self.player.execute_async(Command.REPEAT))
+        self.controlpane_layout.addWidget(self.repeat_button, 0, 7, 1, 1)
+
+        self.source_button = QPushButton()
+        self.source_button.clicked.connect(lambda: self.player.execute_async(Command.PLAY_FAVORITES))
+        self.controlpane_layout.addWidget(self.source_button, 1, 4, 1, 1)
+        self.update_mode_buttons()
+
 
     # 收藏当前歌曲
     def mark_like(self):
-        self.player.execute(Command.TOGGLE_FAVORITE)
+        self.player.execute_async(Command.TOGGLE_FAVORITE)
+
+
+    # 命令都交给播放线程异步执行，界面在收到状态变化通知后再更新
+    def on_player_changed(self, kind):
+        self.update_label()
         self.update_like_button()
-        self.new_favorite.emit()
+        if kind == "song":
+            self.new_song.emit()
+        elif kind == "favorite":
+            self.new_favorite.emit()
+        elif kind == "mode":
+            self.update_mode_buttons()
+
+
+    REPEAT_TEXTS = {"all": "列表循环", "one": "单曲循环", "off": "顺序播放"}
+
+    def update_mode_buttons(self):
+        queue = self.player.play_queue
+        self.shuffle_button.setText("随机：开" if queue.shuffle else "随机：关")
+        self.repeat_button.setText(self.REPEAT_TEXTS[queue.repeat])
+        self.source_button.setText("播放收藏" if self.player.play_favorites else "播放全部")
 
 
     def update_like_button(self):
@@ -198,28 +372,20 @@ class ControlPane(QFrame):
 
 
     def volume_up(self):
-        self.player.execute(Command.VOLUME_UP)
+        self.player.execute_async(Command.VOLUME_UP)
 
 
     def volume_down(self):
-        self.player.execute(Command.VOLUME_DOWN)
+        self.player.execute_async(Command.VOLUME_DOWN)
 
 
     def next_song(self):
-        self.player.execute(Command.NEXT)
-        self.update_label()
-        self.update_like_button()
-        self.new_song.emit()
+        self.player.execute_async(Command.NEXT)
 
 
     def previous_song(self):
-        self.player.execute(Command.PREVIOUS)
-        self.update_label()
-        self.update_like_button()
-        self.new_song.emit()
+        self.player.execute_async(Command.PREVIOUS)
 
 
     def toggle_player_status(self):
-        self.player.execute(Command.TOGGLE)
-        self.update_label()
-        self.update_like_button()
+        self.player.execute_async(Command.TOGGLE)
@@ -0,0 +1,121 @@
+import csv
+import json
+import math
+import time
+import threading
+import numpy as np
+from contextlib import contextmanager
+
+# 帧率直方图的分组边界（FPS）
+FPS_BINS = (0, 5, 10, 15, 20, 25, 30, 45, 60, math.inf)
+
+
+# 性能遥测：各阶段的耗时以纳秒整数（time.perf_counter_ns）保存在固定长度的环形缓冲区中，
+# 记录一次只是一次数组写入，可以在任意线程中调用；查询时才计算最近 capacity 个样本的分位数。
+# 阶段名称约定：capture、queue、inference、predict、classify、dispatch、render、end_to_end（流水线），
+# cover_load（封面加载）、track_load（歌曲加载）、tick 记录的帧间隔 frame，
+# 以及只记录一次的 startup_*（从程序开始运行到窗口显示、各模块加载完成、第一帧、第一个手势的时间）
+class Telemetry:
+    def __init__(self, capacity=512):
+        self.capacity = capacity
+        self.started_at = time.time()
+        self.__samples = {}
+        self.__counts = {}
+        self.__ticks = {}
+        self.__lock = threading.Lock()
+
+    def record_ns(self, stage, nanoseconds):
+        with self.__lock:
+            samples = self.__samples.get(stage)
+            if samples is None:
+                samples = self.__samples[stage] = np.zeros(self.capacity, dtype=np.int64)
+                self.__counts[stage] = 0
+            samples[self.__counts[stage] % self.capacity] = nanoseconds
+            self.__counts[stage] += 1
+
+    # 以秒为单位记录，用于已经用 time.perf_counter() 计时的代码
+    def record(self, stage, seconds):
+        self.record_ns(stage, int(seconds * 1e9))
+
+    # with telemetry.measure("stage"): ... 记录代码块的耗时
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record_ns(stage, time.perf_counter_ns() - start)
+
+    # 记录与上一次 tick 之间的间隔，第一次调用只记下时间
+    def tick(self, stage="frame"):
+        now = time.perf_counter_ns()
+        previous = self.__ticks.get(stage)
+        self.__ticks[stage] = now
+        if previous is not None:
+            self.record_ns(stage, now - previous)
+
+    # 按帧间隔中位数计算的滚动帧率，样本不足时返回 None
+    def fps(self, stage="frame"):
+        valid = self.__valid(stage)
+        if valid is None:
+            return None
+        median = np.median(valid)
+        return 1e9 / median if median > 0 else None
+
+    # 最近样本的帧率直方图，返回 [(下限, 上限, 帧数)]
+    def fps_histogram(self, stage="frame", bins=FPS_BINS):
+        valid = self.__valid(stage)
+        if valid is None:
+            return []
+        fps = 1e9 / np.maximum(valid, 1)
+        counts, _ = np.histogram(fps, bins=bins)
+        return [(bins[i], bins[i + 1], int(counts[i])) for i in range(len(counts))]
+
+    # 返回 {阶段: (样本总数, p50, p95, p99, 最大值)}，单位为毫秒
+    def summary(self):
+        with self.__lock:
+            stages = list(self.__samples)
+        result = {}
+        for stage in stages:
+            valid = self.__valid(stage) / 1e6
+            p50, p95, p99 = np.percentile(valid, [50, 95, 99])
+            result[stage] = (self.__counts[stage], p50, p95, p99, valid.max())
+        return result
+
+    def format(self):
+        return "; ".join(f"{stage}: p50={p50:.1f}ms p95={p95:.1f}ms p99={p99:.1f}ms (n={count})"
+                         for stage, (count, p50, p95, p99, peak) in self.summary().items())
+
+    # 按扩展名导出为 JSON 或 CSV，用于比较不同版本的性能
+    def dump(self, path):
+        summary = self.summary()
+        if path.endswith(".csv"):
+            with open(path, "w", newline="", encoding="UTF-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["stage", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+                for stage, values in summary.items():
+                    writer.writerow([stage, values[0]] + [f"{value:.3f}" for value in values[1:]])
+            return
+        with open(path, "w", encoding="UTF-8") as f:
+            json.dump(self.to_dict(summary), f, indent=2)
+
+    # JSON 导出与本地控制接口（ControlServer 的 /metrics）使用的数据
+    def to_dict(self, summary=None):
+        if summary is None:
+            summary = self.summary()
+        return {
+            "started_at": self.started_at,
+            "duration": time.time() - self.started_at,
+            "fps": self.fps(),
+            "fps_histogram": [[low, None if math.isinf(high) else high, count]
+                              for low, high, count in self.fps_histogram()],
+            "stages": {stage: dict(zip(("count", "p50_ms", "p95_ms", "p99_ms", "max_ms"), values))
+                       for stage, values in summary.items()},
+        }
+
+    def __valid(self, stage):
+        with self.__lock:
+            samples = self.__samples.get(stage)
+            if samples is None:
+                return None
+            return samples[:min(self.__counts[stage], self.capacity)].copy()
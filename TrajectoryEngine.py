@@ -0,0 +1,179 @@
+import math
+from Command import Command
+
+
+# 手势中心轨迹的动态手势识别，每帧输入一个 (timestamp, center)，所有判断都是增量更新，每帧 O(1)：
+# - 挥手：用环形缓冲区保存最近的位置，维护时间窗口的起点（只向前移动），窗口内的平均速度超过
+#   swipe_speed 时按方向判定为左/右/上/下挥手。窗口长度为 swipe_window，推理帧率较低（例如推理调度跳帧）时
+#   按实际的采样间隔放宽到至少两个完整的间隔，保证窗口内有挥手前后的采样；
+# - 画圈：累计运动方向的转角与路径长度，同一方向累计转过 circle_angle 度、且路径足够长（半径不小于 min_radius）
+#   时判定为顺时针/逆时针画圈，持续画圈时每转一圈触发一次，可以当作旋钮使用；
+# - 挥手后保持：可重复的挥手（默认为切歌）之后 arm_timeout 秒内做出保持手势（hold_pose，由调用方判断），
+#   并在原地保持超过 hold_delay 秒，之后每隔 repeat_interval 秒重复触发一次；挥手后只是停住不会重复
+class TrajectoryEngine:
+    # 挥手方向（画面坐标系，y 轴向下）与画圈方向对应的命令
+    SWIPES = {"right": Command.NEXT, "left": Command.PREVIOUS, "up": Command.SHUFFLE, "down": Command.RESTART}
+    CIRCLES = {"clockwise": Command.SEEK_FORWARD, "counterclockwise": Command.SEEK_BACKWARD}
+
+    def __init__(self, swipe_speed=1200, swipe_window=0.15, swipe_angle=30, swipe_cooldown=0.3, max_window=0.5,
+                 capacity=64,
+                 circle_angle=360, circle_timeout=1.5, min_radius=40, min_step=3,
+                 hold_radius=40, hold_delay=0.6, repeat_interval=1.0, arm_timeout=1.5,
+                 repeatable=(Command.NEXT, Command.PREVIOUS)):
+        self.swipe_speed = swipe_speed
+        self.swipe_window = swipe_window
+        self.swipe_angle = swipe_angle  # 挥手方向与坐标轴的最大夹角（度）
+        self.swipe_cooldown = swipe_cooldown  # 挥手后在该时间内不再判定挥手，手臂的余势不会被当成第二次挥手
+        self.max_window = max_window  # 按采样间隔放宽后的窗口长度上限（秒）
+        self.circle_angle = math.radians(circle_angle)
+        self.circle_timeout = circle_timeout  # 画一圈的最长时间（秒）
+        self.min_radius = min_radius
+        self.min_step = min_step  # 位移小于该值（像素）时不计算运动方向，避免关键点抖动被当成转向
+        self.hold_radius = hold_radius
+        self.hold_delay = hold_delay
+        self.repeat_interval = repeat_interval
+        self.arm_timeout = arm_timeout  # 挥手后在该时间内做出保持手势才会开始重复
+        self.repeatable = frozenset(repeatable)
+
+        # 环形缓冲区：位置 i 保存在 i % capacity，head 为下一次写入的位置，start 为时间窗口起点
+        self.capacity = capacity
+        self.__times = [0.0] * capacity
+        self.__xs = [0] * capacity
+        self.__ys = [0] * capacity
+        self.__interval = None  # 采样间隔的指数滑动平均（秒），与手的状态无关，reset 时保留
+        self.reset()
+
+    def reset(self):
+        self.__head = 0
+        self.__start = 0
+        self.__reset_circle(None)
+        self.__hold_command = None
+        self.__swiped_at = None
+
+    # hold_pose 表示本帧的手形是否为保持手势，只用于挥手后的连续触发
+    def update(self, timestamp, center, hold_pose=False) -> Command:
+        x, y = center
+        command = self.__update_hold(timestamp, x, y, hold_pose)
+        previous = self.__append(timestamp, x, y)
+
+        swipe = self.__match_swipe(timestamp, x, y)
+        if swipe != Command.NONE:
+            # 挥手之后重新开始积累轨迹，同一次挥手不会被判定两次，也不会被当成画圈的一部分
+            self.__start = self.__head - 1
+            self.__reset_circle(timestamp)
+            self.__swiped_at = timestamp
+            if swipe in self.repeatable:
+                self.__hold_command = swipe
+                self.__hold_anchor = (x, y)
+                self.__hold_since = timestamp
+                self.__repeating = False
+            return swipe
+
+        if previous is not None:
+            circle = self.__match_circle(timestamp, previous, x, y)
+            if circle != Command.NONE:
+                return circle
+        return command
+
+    # 写入新位置，返回上一个位置（没有时为 None）
+    def __append(self, timestamp, x, y):
+        previous = None
+        if self.__head > 0:
+            i = (self.__head - 1) % self.capacity
+            previous = (self.__times[i], self.__xs[i], self.__ys[i])
+            interval = timestamp - previous[0]
+            if interval > 0:
+                self.__interval = interval if self.__interval is None else self.__interval * 0.7 + interval * 0.3
+        i = self.__head % self.capacity
+        self.__times[i], self.__xs[i], self.__ys[i] = timestamp, x, y
+        self.__head += 1
+        # 缓冲区写满时窗口起点不能落在被覆盖的位置上
+        self.__start = max(self.__start, self.__head - self.capacity)
+        return previous
+
+    def __match_swipe(self, timestamp, x, y):
+        if self.__swiped_at is not None and timestamp - self.__swiped_at < self.swipe_cooldown:
+            return Command.NONE
+        # 窗口至少包含两个完整的采样间隔（时间戳有抖动，按 2.5 个间隔计算），稀疏采样时挥手前后的两个采样都在窗口内
+        window = self.swipe_window
+        if self.__interval is not None:
+            window = min(max(window, 2.5 * self.__interval), self.max_window)
+        while self.__start + 1 < self.__head and self.__times[self.__start % self.capacity] < timestamp - window:
+            self.__start += 1
+        i = self.__start % self.capacity
+        elapsed = timestamp - self.__times[i]
+        if elapsed < self.swipe_window / 2:
+            return Command.NONE
+        dx, dy = x - self.__xs[i], y - self.__ys[i]
+        distance = math.hypot(dx, dy)
+        # 窗口放宽后挥手的起止时刻只能确定到采样间隔以内，经过的时间扣除半个采样间隔（不少于 swipe_window），
+        # 速度阈值本身不随帧率变化，缓慢移动不会因为窗口变长而被当成挥手
+        duration = elapsed
+        if elapsed > self.swipe_window:
+            duration = max(self.swipe_window, elapsed - self.__interval / 2)
+        if distance / duration <= self.swipe_speed:
+            return Command.NONE
+        limit = math.cos(math.radians(self.swipe_angle))
+        if abs(dx) >= distance * limit:
+            return self.SWIPES["right" if dx > 0 else "left"]
+        if abs(dy) >= distance * limit:
+            return self.SWIPES["down" if dy > 0 else "up"]
+        return Command.NONE
+
+    def __reset_circle(self, timestamp):
+        self.__heading = None
+        self.__turned = 0.0
+        self.__path = 0.0
+        self.__circle_since = timestamp
+
+    def __match_circle(self, timestamp, previous, x, y):
+        _, px, py = previous
+        step = math.hypot(x - px, y - py)
+        if step < self.min_step:
+            return Command.NONE
+        if self.__circle_since is None or timestamp - self.__circle_since > self.circle_timeout:
+            self.__reset_circle(timestamp)
+
+        heading = math.atan2(y - py, x - px)
+        if self.__heading is not None:
+            turn = (heading - self.__heading + math.pi) % (2 * math.pi) - math.pi
+            if self.__turned * turn < 0 and abs(turn) > math.pi / 2:
+                # 方向突然反转，不是连续的画圈
+                self.__reset_circle(timestamp)
+            else:
+                self.__turned += turn
+                self.__path += step
+        self.__heading = heading
+
+        if abs(self.__turned) < self.circle_angle:
+            return Command.NONE
+        if self.__path < self.min_radius * self.circle_angle:
+            self.__reset_circle(timestamp)
+            self.__heading = heading
+            return Command.NONE
+        # 画面坐标系中 y 轴向下，转角增加对应屏幕上的顺时针
+        command = self.CIRCLES["clockwise" if self.__turned > 0 else "counterclockwise"]
+        self.__turned -= math.copysign(self.circle_angle, self.__turned)
+        self.__path = 0.0
+        self.__circle_since = timestamp
+        return command
+
+    def __update_hold(self, timestamp, x, y, hold_pose):
+        if self.__hold_command is None:
+            return Command.NONE
+        moved = math.hypot(x - self.__hold_anchor[0], y - self.__hold_anchor[1]) > self.hold_radius
+        if moved or not hold_pose:
+            # 手还在移动或还没有做出保持手势：重新设定停留位置和开始时间；
+            # 已经在重复时离开原位或放下保持手势则停止重复，挥手后超过 arm_timeout 仍未保持也不再等待
+            if self.__repeating or timestamp - self.__swiped_at > self.arm_timeout:
+                self.__hold_command = None
+                return Command.NONE
+            self.__hold_anchor = (x, y)
+            self.__hold_since = timestamp
+            return Command.NONE
+        if timestamp - self.__hold_since < self.hold_delay:
+            return Command.NONE
+        self.__repeating = True
+        # 按预定的时间而不是实际触发的时间安排下一次，推理帧率较低时重复间隔不会逐次变长
+        self.__hold_since = max(self.__hold_since + self.repeat_interval, timestamp - self.hold_delay)
+        return self.__hold_command
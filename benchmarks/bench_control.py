@@ -0,0 +1,100 @@
+# 本地控制接口压测：通过 HTTP keep-alive 连接连续发送命令，统计请求吞吐量与延迟，
+# 并对比压测前后 /metrics 中的帧率，确认控制接口不影响摄像头流水线
+#
+# 用法：先启动 python headless.py --control（或 python main.py --control），再运行
+#       python benchmarks/bench_control.py [--address 127.0.0.1:8765] [--requests 2000] [--connections 4]
+#   默认交替发送 VOLUME_UP 和 VOLUME_DOWN，不会切换歌曲；--commands 可以指定其他命令；
+#   --batch 大于 1 时每个请求用 POST /commands 发送多个命令
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ControlServer import parse_address
+
+
+def connect(address):
+    host, port, unix_path = parse_address(address)
+    if unix_path is None:
+        return http.client.HTTPConnection(host, port, timeout=10)
+    import socket
+
+    class UnixConnection(http.client.HTTPConnection):
+        def connect(self):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(unix_path)
+
+    return UnixConnection("localhost", timeout=10)
+
+
+def get(address, path):
+    connection = connect(address)
+    connection.request("GET", path)
+    data = json.loads(connection.getresponse().read())
+    connection.close()
+    return data
+
+
+# 在一个连接上依次发送 count 个请求，把每个请求的延迟（纳秒）写入 latencies
+def send(address, commands, count, batch, latencies, errors):
+    connection = connect(address)
+    for i in range(count):
+        if batch > 1:
+            names = [commands[(i * batch + j) % len(commands)] for j in range(batch)]
+            method, path, body = "POST", "/commands", json.dumps(names)
+        else:
+            method, path, body = "POST", f"/commands/{commands[i % len(commands)]}", None
+        start = time.perf_counter_ns()
+        connection.request(method, path, body)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter_ns() - start)
+        if response.status != 202:
+            errors.append(response.status)
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地控制接口压测")
+    parser.add_argument("--address", default="", help="控制接口地址，默认 127.0.0.1:8765")
+    parser.add_argument("--requests", type=int, default=2000, help="每个连接发送的请求数")
+    parser.add_argument("--connections", type=int, default=4, help="并发连接数")
+    parser.add_argument("--batch", type=int, default=1, help="每个请求包含的命令数")
+    parser.add_argument("--commands", nargs="+", default=["VOLUME_UP", "VOLUME_DOWN"], help="依次发送的命令")
+    args = parser.parse_args()
+
+    before = get(args.address, "/metrics")
+    latencies = [[] for _ in range(args.connections)]
+    errors = []
+    threads = [threading.Thread(target=send, args=(args.address, args.commands, args.requests, args.batch, latencies[i], errors))
+               for i in range(args.connections)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    after = get(args.address, "/metrics")
+
+    latencies = np.concatenate([np.array(values, dtype=np.float64) for values in latencies]) / 1e6
+    requests = len(latencies)
+    print(f"{requests} 个请求（{requests * args.batch} 个命令），用时 {elapsed:.2f}s，"
+          f"{requests / elapsed:.0f} 请求/秒，{requests * args.batch / elapsed:.0f} 命令/秒，错误 {len(errors)}")
+    print(f"请求延迟：p50 {np.percentile(latencies, 50):.2f}ms  p99 {np.percentile(latencies, 99):.2f}ms  "
+          f"最大 {latencies.max():.2f}ms")
+    fps_before, fps_after = before["fps"], after["fps"]
+    print(f"帧率：压测前 {'-' if fps_before is None else f'{fps_before:.1f}'}，"
+          f"压测后 {'-' if fps_after is None else f'{fps_after:.1f}'}")
+    for stage in ("control_request", "control_to_command", "inference"):
+        values = after["stages"].get(stage)
+        if values is not None:
+            print(f"{stage}: p50 {values['p50_ms']:.3f}ms  p99 {values['p99_ms']:.3f}ms  (n={values['count']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# 画面显示路径基准测试：对比旧实现（每帧翻转、BGR->RGB、BGR->BGRA 各分配一块新数组）
+# 与新实现（翻转和颜色转换写入预分配缓冲区，QImage 直接引用 BGR 缓冲区）的逐帧耗时和内存分配次数
+#
+# 用法：python benchmarks/bench_frame_path.py [录制目录] [--frames N] [--width W --height H]
+#   不指定录制目录时使用随机画面；分配次数通过 tracemalloc 统计 NumPy 数组的分配，
+#   Qt 内部（QPixmap.fromImage 等）的分配不在统计范围内，两种实现在这部分是相同的
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import cv2 as cv
+import numpy as np
+from PyQt5.QtGui import QImage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from CameraPipeline import FramePool
+
+MIN_BLOCK = 4096  # 只统计不小于该大小的分配，即画面大小的数组
+
+
+def load_frames(args):
+    frames_path = os.path.join(args.recording, "frames.npy") if args.recording else None
+    if frames_path and os.path.exists(frames_path):
+        frames = np.load(frames_path, mmap_mode="r")
+        return [np.array(frame) for frame in frames[:args.frames]]
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8) for _ in range(min(args.frames, 8))]
+
+
+# 改造前：采集线程翻转，推理前转换为 RGB，显示前再转换为 BGRA
+def legacy_path(raw):
+    frame = cv.flip(raw, 1)
+    rgb = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
+    bgra = cv.cvtColor(frame, cv.COLOR_BGR2BGRA)
+    image = QImage(bgra.data, bgra.shape[1], bgra.shape[0], QImage.Format_RGB32)
+    return frame, rgb, bgra, image
+
+
+class BufferedPath:
+    def __init__(self):
+        self.pool = FramePool()
+        self.rgb = None
+
+    def __call__(self, raw):
+        frame = self.pool.acquire(raw.shape)
+        cv.flip(raw, 1, dst=frame)
+        if self.rgb is None or self.rgb.shape != frame.shape:
+            self.rgb = np.empty_like(frame)
+        rgb = cv.cvtColor(frame, cv.COLOR_BGR2RGB, dst=self.rgb)
+        image = QImage(frame.data, frame.shape[1], frame.shape[0], frame.strides[0], QImage.Format_BGR888)
+        # 显示完成后归还缓冲区
+        self.pool.release(frame)
+        return frame, rgb, image
+
+
+def measure(frames, count, path):
+    # 预热，让缓冲池等在首帧完成分配
+    for frame in frames[:2]:
+        path(frame)
+
+    latencies = []
+    for i in range(count):
+        frame = frames[i % len(frames)]
+        start = time.perf_counter()
+        path(frame)
+        latencies.append(time.perf_counter() - start)
+
+    # 分配次数单独统计：保留每帧的输出直到拍下快照，模拟流水线中画面在各阶段之间被持有
+    allocations, allocated = 0, 0
+    domain_filter = [tracemalloc.DomainFilter(True, np.lib.tracemalloc_domain)]
+    tracemalloc.start()
+    for i in range(count):
+        before = tracemalloc.take_snapshot().filter_traces(domain_filter)
+        outputs = path(frames[i % len(frames)])
+        after = tracemalloc.take_snapshot().filter_traces(domain_filter)
+        for stat in after.compare_to(before, "traceback"):
+            if stat.count_diff > 0 and stat.size_diff >= MIN_BLOCK:
+                allocations += stat.count_diff
+                allocated += stat.size_diff
+        del outputs
+    tracemalloc.stop()
+    return np.array(latencies) * 1000, allocations / count, allocated / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比画面显示路径的耗时与内存分配")
+    parser.add_argument("recording", nargs="?", help="录制目录（包含 frames.npy），不指定时使用随机画面")
+    parser.add_argument("--frames", type=int, default=200, help="测试的帧数")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    frames = load_frames(args)
+    height, width = frames[0].shape[:2]
+    print(f"{width}x{height}，{args.frames} 帧")
+    for name, path in (("legacy", legacy_path), ("buffered", BufferedPath())):
+        latencies, allocations, allocated = measure(frames, args.frames, path)
+        print(f"{name:>9}: p50 {np.percentile(latencies, 50):.3f} ms, p95 {np.percentile(latencies, 95):.3f} ms, "
+              f"每帧分配 {allocations:.2f} 次 / {allocated / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# 手指几何计算基准测试：对比 fingersVector 逐帧标量计算与 fingersVectorBatch 批量计算的耗时，并校验结果一致
+#
+# 用法：python benchmarks/bench_geometry.py [--frames N] [--repeat R] [--landmarks 录制的 (N, 21, 2) .npy 文件]
+#   两种实现都取 R 次运行中最快的一次
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fingersVector import fingersUp, vectorSize, vectorAngle, vectorAngle2, mkVector
+from fingersVectorBatch import FINGER_CHAINS, batchFingersUp, batchVectorAngle2, pairwiseDistances, jointAngles
+
+
+def timed(function, args, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def scalar_fingers(landmarks):
+    return [fingersUp(frame) for frame in landmarks]
+
+
+def scalar_distances(landmarks):
+    return [[[vectorSize(p1, p2) for p2 in frame] for p1 in frame] for frame in landmarks]
+
+
+def scalar_angles(landmarks):
+    return [[[vectorAngle(frame[chain[i]], frame[chain[i + 1]], frame[chain[i + 2]]) for i in range(3)]
+             for chain in FINGER_CHAINS] for frame in landmarks]
+
+
+def scalar_center_angles(landmarks):
+    # 与挥手识别相同：手掌中心相对上一帧的位移与 x 轴的夹角
+    return [vectorAngle2(mkVector(current[9], previous[9]), (1, 0)) for previous, current in zip(landmarks[:-1], landmarks[1:])]
+
+
+def batch_center_angles(landmarks):
+    return batchVectorAngle2(landmarks[1:, 9] - landmarks[:-1, 9], np.array([1, 0]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比标量与批量手指几何计算")
+    parser.add_argument("--frames", type=int, default=2000, help="随机生成的帧数")
+    parser.add_argument("--repeat", type=int, default=3, help="每种实现运行的次数")
+    parser.add_argument("--landmarks", help="录制的 (N, 21, 2) 关键点 .npy 文件，指定后不再随机生成")
+    args = parser.parse_args()
+
+    if args.landmarks:
+        landmarks = np.load(args.landmarks).astype(np.int32)
+    else:
+        rng = np.random.default_rng(0)
+        landmarks = rng.integers(0, (640, 480), size=(args.frames, 21, 2), dtype=np.int32)
+    # 标量函数使用 Python 整数，与实时识别时的输入一致
+    landmark_lists = landmarks.tolist()
+
+    cases = [
+        ("fingersUp", scalar_fingers, batchFingersUp, lambda x: np.array(x)),
+        ("vectorSize", scalar_distances, pairwiseDistances, lambda x: np.array(x)),
+        ("vectorAngle", scalar_angles, jointAngles, lambda x: np.array(x)),
+        ("vectorAngle2", scalar_center_angles, batch_center_angles, lambda x: np.array(x, dtype=np.float64)),
+    ]
+    print(f"frames={len(landmarks)}")
+    for name, scalar, batch, to_array in cases:
+        expected, scalar_time = timed(scalar, landmark_lists, args.repeat)
+        actual, batch_time = timed(batch, landmarks, args.repeat)
+        same = np.allclose(to_array(expected), actual, atol=1e-6, equal_nan=True)
+        print(f"{name:<14} scalar={scalar_time * 1000:9.2f}ms batch={batch_time * 1000:8.2f}ms "
+              f"speedup={scalar_time / max(batch_time, 1e-9):8.1f}x match={same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# 关键点提取阶段基准测试：回放录制的画面，对比旧实现（每帧两次推理 + 构建元组列表）与新实现的逐帧耗时
+#
+# 用法：python benchmarks/bench_landmark.py <视频文件 | 图片序列模式 | .npy 帧数组> [--limit N] [--repeat R]
+import os
+import sys
+import time
+import argparse
+import cv2 as cv
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from GestureRecognizer import GestureRecognizer
+
+
+def load_frames(path, limit):
+    # .npy 文件按 (N, H, W, 3) 的 BGR 帧数组读取，其余交给 OpenCV（视频文件或 frame_%04d.png 形式的图片序列）
+    if path.endswith(".npy"):
+        frames = np.load(path, mmap_mode="r")
+        return [np.array(frame) for frame in frames[:limit]]
+    capture = cv.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+# 改造前的 get_landmark，保留在此作为对照
+def legacy_get_landmark(recognizer, frame):
+    imgRGB = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
+    result = recognizer.hands.process(imgRGB)
+    hand_point = result.multi_hand_landmarks
+    result = recognizer.hands.process(imgRGB)
+    hand_point = result.multi_hand_landmarks
+
+    landmark = []
+    if hand_point:
+        for handlms in hand_point:
+            recognizer.mp_drawing.draw_landmarks(frame, handlms, recognizer.mp_hands.HAND_CONNECTIONS,
+                                                 recognizer.handMsStyle, recognizer.handConStyle)
+            for i, lm in enumerate(handlms.landmark):
+                posX = int(lm.x * frame.shape[1])
+                posY = int(lm.y * frame.shape[0])
+                landmark.append((posX, posY))
+                cv.putText(frame, str(i), (posX, posY), cv.FONT_HERSHEY_PLAIN, 2, (255, 0, 0), thickness=2)
+        return landmark
+    else:
+        raise RuntimeError()
+
+
+def replay(frames, repeat, get_landmark):
+    latencies = []
+    detected = 0
+    for _ in range(repeat):
+        for frame in frames:
+            # 绘制会修改画面，每次回放都使用副本
+            frame = frame.copy()
+            start = time.perf_counter_ns()
+            try:
+                get_landmark(frame)
+                detected += 1
+            except RuntimeError:
+                pass
+            latencies.append(time.perf_counter_ns() - start)
+    return np.array(latencies, dtype=np.float64) / 1e6, detected
+
+
+def report(name, latencies, detected):
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    print(f"{name:<16} frames={len(latencies):<6} hands={detected:<6} "
+          f"mean={latencies.mean():7.2f}ms p50={p50:7.2f}ms p90={p90:7.2f}ms p99={p99:7.2f}ms max={latencies.max():7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比新旧关键点提取路径的逐帧耗时")
+    parser.add_argument("source", help="视频文件、图片序列模式或 (N, H, W, 3) 的 .npy 帧数组")
+    parser.add_argument("--limit", type=int, default=300, help="最多读取的帧数")
+    parser.add_argument("--repeat", type=int, default=1, help="回放次数")
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.limit)
+    if not frames:
+        sys.exit(f"无法从 {args.source} 读取画面")
+
+    # 每条路径使用独立的识别器，避免跟踪状态互相影响
+    paths = [
+        ("legacy", lambda: GestureRecognizer(), legacy_get_landmark),
+        ("new (draw)", lambda: GestureRecognizer(), lambda recognizer, frame: recognizer.get_landmark(frame, draw=True)),
+        ("new (no draw)", lambda: GestureRecognizer(), lambda recognizer, frame: recognizer.get_landmark(frame, draw=False)),
+    ]
+    for name, make_recognizer, path in paths:
+        recognizer = make_recognizer()
+        latencies, detected = replay(frames, args.repeat, lambda frame: path(recognizer, frame))
+        report(name, latencies, detected)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# 流水线基准测试：不需要摄像头和界面，回放录制数据并统计吞吐量与各阶段延迟
+#
+# 用法：python benchmarks/bench_pipeline.py <录制目录> [--threaded] [--landmarks-only]
+#   默认在单线程中全速逐帧处理，结果可复现，用于比较吞吐量；
+#   --threaded 按录制速度把画面送入多线程流水线，用于观察实时运行时的延迟与丢帧；
+#   --max-interval 大于 1 时允许推理调度跳帧；
+#   --hands 大于 1 时检测多只手，用于对比多手检测对吞吐量的影响；
+#   --metrics 导出统计结果
+import os
+import sys
+import time
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from GestureRecognizer import GestureRecognizer
+from CameraPipeline import CameraPipeline, InferenceScheduler
+from FrameSource import ReplaySource
+from HandTracker import ARBITRATION_POLICIES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放录制数据测试流水线性能")
+    parser.add_argument("recording", help="录制目录")
+    parser.add_argument("--threaded", action="store_true", help="按录制速度使用多线程流水线")
+    parser.add_argument("--landmarks-only", action="store_true", help="只回放关键点，跳过推理")
+    parser.add_argument("--max-interval", type=int, default=1, help="推理调度允许的最大跳帧间隔，1 表示每帧都推理")
+    parser.add_argument("--hands", type=int, default=1, help="最多检测的手的数量")
+    parser.add_argument("--arbitration", choices=ARBITRATION_POLICIES, default="largest", help="多只手时选择控制手的策略")
+    parser.add_argument("--metrics", metavar="FILE", help="将各阶段耗时导出到该文件（.json 或 .csv），用于比较不同版本")
+    args = parser.parse_args()
+
+    source = ReplaySource(args.recording, realtime=args.threaded, landmarks_only=args.landmarks_only)
+    commands = Counter()
+    recognizer = GestureRecognizer(max_num_hands=args.hands, arbitration=args.arbitration)
+    pipeline = CameraPipeline(source, recognizer, lambda command, captured_at: commands.update([command.name]),
+                              lambda frame: None, scheduler=InferenceScheduler(max_interval=args.max_interval))
+
+    start = time.perf_counter()
+    if args.threaded:
+        pipeline.start()
+        duration = source.timestamps[-1] - source.timestamps[0]
+        time.sleep(duration + 0.5)
+        pipeline.stop()
+    else:
+        pipeline.run_sync()
+    elapsed = time.perf_counter() - start
+
+    print(f"frames={len(source)} processed={pipeline.frames} elapsed={elapsed:.2f}s "
+          f"throughput={pipeline.frames / elapsed:.1f} FPS")
+    print(f"commands={dict(commands)} inference_interval={pipeline.scheduler.interval}")
+    for stage, (count, p50, p95, p99, peak) in pipeline.stats.summary().items():
+        print(f"{stage:<12} n={count:<6} p50={p50:7.2f}ms p95={p95:7.2f}ms p99={p99:7.2f}ms max={peak:7.2f}ms")
+    if args.metrics:
+        pipeline.stats.dump(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
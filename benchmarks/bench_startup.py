@@ -0,0 +1,102 @@
+# 启动基准测试：多次冷启动主程序，统计从开始运行到窗口显示、各模块加载完成、显示第一帧画面、
+# 执行第一个手势命令的耗时
+#
+# 用法：python benchmarks/bench_startup.py [--replay 录制目录] [--runs N] [--timeout 秒]
+#   每次启动都在新的 Python 进程中进行，包含全部模块的导入时间；
+#   不指定 --replay 时使用摄像头，需要在镜头前做出手势才能统计到第一个手势；
+#   指定 --replay 时回放录制数据，录制内容中需要包含能被识别出的手势；
+#   没有显示器时可以设置环境变量 QT_QPA_PLATFORM=offscreen
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (Telemetry 中的阶段名称, 显示名称)
+MILESTONES = (
+    ("startup_window", "窗口显示"),
+    ("startup_player", "播放器就绪"),
+    ("startup_camera", "画面来源就绪"),
+    ("startup_recognizer", "手势模型就绪"),
+    ("startup_first_frame", "第一帧画面"),
+    ("startup_first_gesture", "第一个手势"),
+)
+
+
+# 子进程：与 main.py 相同的方式启动程序，记录到第一个手势（或超时）为止，以 JSON 输出各阶段耗时
+def run_child(args):
+    sys.path.insert(0, ROOT)
+    import main
+    from PyQt5 import QtCore
+    from PyQt5.QtWidgets import QApplication
+    import qdarkstyle
+
+    app = QApplication(sys.argv[:1])
+    app.setStyleSheet(qdarkstyle.load_stylesheet(qt_api="pyqt5"))
+    source = None
+    if args.replay:
+        source = lambda: main.open_replay(args)
+    window = main.MainWindow(source)
+    window.show()
+
+    results = {}
+
+    def poll():
+        summary = window.telemetry.summary()
+        for stage, _ in MILESTONES:
+            if stage in summary:
+                results[stage] = summary[stage][1]
+        if "startup_first_gesture" in results:
+            window.close()
+            app.quit()
+
+    timer = QtCore.QTimer()
+    timer.timeout.connect(poll)
+    timer.start(10)
+    QtCore.QTimer.singleShot(int(args.timeout * 1000), lambda: (poll(), window.close(), app.quit()))
+    app.exec_()
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测试程序冷启动耗时")
+    parser.add_argument("--replay", metavar="DIR", help="回放录制目录中的画面或关键点，代替摄像头")
+    parser.add_argument("--landmarks-only", action="store_true", help="回放时只使用录制的关键点，跳过推理")
+    parser.add_argument("--runs", type=int, default=5, help="启动次数")
+    parser.add_argument("--timeout", type=float, default=20.0, help="每次启动等待第一个手势的最长时间（秒）")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.max_speed = False
+
+    if args.child:
+        run_child(args)
+        return
+
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--timeout", str(args.timeout)]
+    if args.replay:
+        command += ["--replay", os.path.abspath(args.replay)]
+    if args.landmarks_only:
+        command.append("--landmarks-only")
+
+    runs = []
+    for i in range(args.runs):
+        output = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        runs.append(result)
+        print(f"第 {i + 1} 次：" + ", ".join(f"{name} {result[stage]:.0f}ms" for stage, name in MILESTONES if stage in result))
+
+    print(f"{args.runs} 次启动（毫秒）：")
+    for stage, name in MILESTONES:
+        values = [result[stage] for result in runs if stage in result]
+        if not values:
+            print(f"{name:<8} -")
+            continue
+        print(f"{name:<8} 中位数 {statistics.median(values):7.0f}  最小 {min(values):7.0f}  最大 {max(values):7.0f}"
+              f"  ({len(values)}/{args.runs})")
+
+
+if __name__ == "__main__":
+    main()
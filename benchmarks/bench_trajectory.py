@@ -0,0 +1,107 @@
+# 动态手势回放检查：合成手势中心的轨迹，按不同的推理帧率采样后交给 TrajectoryEngine，
+# 统计每种动作识别出的命令与每次 update 的耗时。推理调度跳帧（InferenceScheduler 的 max_interval=4）时
+# 30 fps 的摄像头只有约 7 fps 的推理结果，挥手在这个帧率下也应当被识别，慢速移动在任何帧率下都不应判定为挥手
+#
+# 用法：python benchmarks/bench_trajectory.py [--fps 30 15 7] [--phases 8]
+#   每个动作在一个采样间隔内取 --phases 个不同的起始相位，结果一栏为识别出的命令及次数
+import os
+import sys
+import math
+import time
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Command import Command
+from TrajectoryEngine import TrajectoryEngine
+
+CENTER = (320, 240)
+
+
+# 挥手：静止 0.5 秒后用 duration 秒移动 distance 像素（先加速后减速），之后停在终点
+def swipe(dx, dy, distance=300, duration=0.2, rest=1.0):
+    def position(t):
+        s = min(max((t - 0.5) / duration, 0), 1)
+        s = (1 - math.cos(math.pi * s)) / 2
+        return CENTER[0] + dx * distance * s, CENTER[1] + dy * distance * s
+    return position, 0.5 + duration + rest
+
+
+# 慢速移动：静止 0.5 秒后以 speed 像素/秒匀速移动 duration 秒，不应判定为挥手
+def drift(dx, dy, speed=700, duration=1.0):
+    def position(t):
+        s = min(max(t - 0.5, 0), duration)
+        return CENTER[0] + dx * speed * s, CENTER[1] + dy * speed * s
+    return position, 0.5 + duration + 0.3
+
+
+# 画圈：静止 0.5 秒后以 period 秒一圈画 turns 圈，direction 为 1 时在画面中顺时针（y 轴向下）
+def circle(direction, radius=80, period=1.0, turns=1.5):
+    def position(t):
+        angle = direction * 2 * math.pi * max(t - 0.5, 0) / period
+        return CENTER[0] + radius * math.cos(angle), CENTER[1] + radius * math.sin(angle)
+    return position, 0.5 + period * turns + 0.3
+
+
+# 每个动作：(名称, 轨迹, 本动作期望的命令, 挥手之后是否做出保持手势)
+def scenarios():
+    return [
+        ("右挥手", *swipe(1, 0), [Command.NEXT], False),
+        ("左挥手", *swipe(-1, 0), [Command.PREVIOUS], False),
+        ("上挥手", *swipe(0, -1), [Command.SHUFFLE], False),
+        ("下挥手", *swipe(0, 1), [Command.RESTART], False),
+        ("右挥手后停住 3 秒", *swipe(1, 0, rest=3.0), [Command.NEXT], False),
+        ("右挥手后伸出食指停住 3 秒", *swipe(1, 0, rest=3.0), [Command.NEXT] * 4, True),
+        ("顺时针画圈", *circle(1), [Command.SEEK_FORWARD], False),
+        ("逆时针画圈", *circle(-1), [Command.SEEK_BACKWARD], False),
+        ("向右慢速移动 700 px/s", *drift(1, 0), [], False),
+        ("向下慢速移动 360 px/s", *drift(0, 1, speed=360), [], False),
+        ("静止", lambda t: CENTER, 2.0, [], False),
+    ]
+
+
+def replay(position, duration, fps, phase, hold_pose):
+    engine = TrajectoryEngine()
+    interval = 1 / fps
+    commands = []
+    elapsed = 0
+    t = phase * interval
+    while t <= duration:
+        x, y = position(t)
+        start = time.perf_counter_ns()
+        command = engine.update(t, (int(x), int(y)), hold_pose and t > 0.9)
+        elapsed += time.perf_counter_ns() - start
+        if command != Command.NONE:
+            commands.append(command)
+        t += interval
+    return commands, elapsed, int(duration / interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="动态手势回放检查")
+    parser.add_argument("--fps", type=float, nargs="+", default=[30, 15, 7], help="推理帧率")
+    parser.add_argument("--phases", type=int, default=8, help="每个动作的起始相位数")
+    args = parser.parse_args()
+
+    failures = 0
+    for fps in args.fps:
+        print(f"推理帧率 {fps:g} fps")
+        for name, position, duration, expected, hold_pose in scenarios():
+            results = Counter()
+            missed = 0
+            elapsed = updates = 0
+            for k in range(args.phases):
+                commands, ns, count = replay(position, duration, fps, k / args.phases, hold_pose)
+                results.update(command.name for command in commands)
+                missed += commands != expected
+                elapsed += ns
+                updates += count
+            failures += missed
+            detected = "，".join(f"{command} x{count}" for command, count in results.items()) or "无"
+            print(f"  {name:<16}{'通过' if missed == 0 else f'{missed}/{args.phases} 次不符'}  "
+                  f"识别：{detected}  每次 update {elapsed / updates / 1000:.1f}us")
+    print("全部通过" if failures == 0 else f"{failures} 次回放与期望不符")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import numpy as np
+
+# fingersVector 的批量版本：输入 (N, 21, 2) 的关键点数组，一次计算 N 帧的结果
+# 结果与 fingersVector 中逐帧计算的标量函数一致，可用于对录制数据的离线重新分类
+
+# 每根手指从手腕起的关节点编号：手腕、根部、中间关节、末端关节、指尖
+FINGER_CHAINS = np.array([
+    [0, 1, 2, 3, 4],      # 大拇指
+    [0, 5, 6, 7, 8],      # 食指
+    [0, 9, 10, 11, 12],   # 中指
+    [0, 13, 14, 15, 16],  # 无名指
+    [0, 17, 18, 19, 20],  # 小拇指
+])
+FINGER_TIPS = FINGER_CHAINS[1:, 4]
+FINGER_PIPS = FINGER_CHAINS[1:, 2]
+
+
+# 计算向量2范数，p1、p2 的形状为 (..., 2)
+def batchVectorSize(p1, p2):
+    diff = np.asarray(p1, dtype=np.float64) - np.asarray(p2, dtype=np.float64)
+    return np.sqrt(diff[..., 0] ** 2 + diff[..., 1] ** 2)
+
+
+# 余弦定理计算以 p2 为顶点的夹角（角度制），边长过短时与标量版本一致返回 0
+def batchVectorAngle(p1, p2, p3):
+    b = batchVectorSize(p2, p1)
+    c = batchVectorSize(p2, p3)
+    a = batchVectorSize(p3, p1)
+    denominator = 2 * b * c
+    valid = denominator > 1e-7
+    cos_theta = np.divide(b ** 2 + c ** 2 - a ** 2, denominator, out=np.ones_like(denominator), where=valid)
+    # 浮点误差可能使余弦值略微超出 [-1, 1]，标量版本此时会抛出 ValueError
+    return np.degrees(np.arccos(np.clip(cos_theta, -1.0, 1.0)))
+
+
+# 计算两个向量的夹角（角度制），任一向量长度过短时返回 nan（标量版本返回 None）
+def batchVectorAngle2(v1, v2):
+    v1 = np.asarray(v1, dtype=np.float64)
+    v2 = np.asarray(v2, dtype=np.float64)
+    nor = np.einsum("...i,...i->...", v1, v2)
+    a = np.einsum("...i,...i->...", v1, v1)
+    b = np.einsum("...i,...i->...", v2, v2)
+    valid = (a > 1e-7) & (b > 1e-7)
+    cos_theta = np.divide(nor, np.sqrt(a * b), out=np.ones_like(nor), where=valid)
+    return np.where(valid, np.degrees(np.arccos(np.clip(cos_theta, -1.0, 1.0))), np.nan)
+
+
+# 所有关键点两两之间的距离，返回 (N, 21, 21)；x、y 分量分开计算并原地累加，避免生成 (N, 21, 21, 2) 的中间数组
+def pairwiseDistances(landmarks):
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    x, y = landmarks[..., 0], landmarks[..., 1]
+    dx = x[:, :, np.newaxis] - x[:, np.newaxis, :]
+    dy = y[:, :, np.newaxis] - y[:, np.newaxis, :]
+    dx *= dx
+    dy *= dy
+    dx += dy
+    return np.sqrt(dx, out=dx)
+
+
+# 每根手指三个关节（根部、中间关节、末端关节）处的夹角，返回 (N, 5, 3)
+def jointAngles(landmarks):
+    chains = np.asarray(landmarks)[:, FINGER_CHAINS]  # (N, 5, 5, 2)
+    return batchVectorAngle(chains[:, :, :-2], chains[:, :, 1:-1], chains[:, :, 2:])
+
+
+# 判断手指是否张开，返回 (N, 5) 的 0/1 数组，顺序与 fingersUp 相同
+def batchFingersUp(landmarks):
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    fingers = np.empty((landmarks.shape[0], 5), dtype=np.int8)
+    # 大拇指
+    fingers[:, 0] = batchVectorAngle(landmarks[:, 0], landmarks[:, 3], landmarks[:, 4]) > 130
+    # 其余四指：指尖到手腕的距离大于中间关节到手腕的距离，比较平方距离即可省去开方
+    wrist = landmarks[:, :1]
+    tips = landmarks[:, FINGER_TIPS] - wrist
+    pips = landmarks[:, FINGER_PIPS] - wrist
+    fingers[:, 1:] = (tips[..., 0] ** 2 + tips[..., 1] ** 2) > (pips[..., 0] ** 2 + pips[..., 1] ** 2)
+    return fingers
@@ -0,0 +1,134 @@
+# 无界面运行：只运行手势识别与音乐播放，不创建窗口、不在画面上绘制，适用于展示机等没有显示需求的设备。
+# 本文件及其导入的模块都不依赖 PyQt5、qtawesome 和 qdarkstyle
+#
+# 用法：python headless.py [--music DIR] [--status] [--replay DIR ...] [--control [ADDR]]
+import sys
+import time
+import signal
+import logging
+import argparse
+import threading
+
+from Command import Command
+from GestureRecognizer import GestureRecognizer
+from MusicPlayer import MusicPlayer
+from CameraPipeline import CameraPipeline
+from FrameSource import CameraSource, ReplaySource, SessionRecorder
+from Telemetry import Telemetry
+from HandTracker import ARBITRATION_POLICIES
+from GestureClassifier import GestureClassifier
+from ControlServer import ControlServer
+
+
+class HeadlessPlayer:
+    def __init__(self, source, music_path="music", recorder=None, telemetry=None, hands=1, arbitration="largest",
+                 classifier=None, control_address=None):
+        self.telemetry = Telemetry() if telemetry is None else telemetry
+        self.player = MusicPlayer(music_path, telemetry=self.telemetry)
+        self.recognizer = GestureRecognizer(max_num_hands=hands, arbitration=arbitration, classifier=classifier)
+        self.source = source
+        self.stopped = threading.Event()
+        self.pipeline = CameraPipeline(self.source, self.recognizer, self.dispatch_command, None,
+                                       recorder=recorder, stats=self.telemetry, draw=False,
+                                       on_finished=self.on_source_finished)
+        self.control_server = None
+        if control_address is not None:
+            self.control_server = ControlServer(self.player, self.dispatch_remote, self.telemetry, control_address)
+
+
+    # 在推理线程中调用，命令交给播放线程异步执行，不阻塞手势识别
+    def dispatch_command(self, command: Command, captured_at: int):
+        if command == Command.EXIT:
+            self.stopped.set()
+            return
+        self.player.execute_async(command)
+        self.telemetry.record_ns("gesture_to_command", time.perf_counter_ns() - captured_at)
+
+
+    # 画面来源结束（回放完毕）时在渲染线程中调用，结束运行
+    def on_source_finished(self):
+        print("画面来源已结束")
+        self.stopped.set()
+
+
+    # 本地控制接口收到的命令，在服务线程中调用，与手势命令一样交给播放线程
+    def dispatch_remote(self, command: Command, received_at: int):
+        if command == Command.EXIT:
+            self.stopped.set()
+            return
+        self.player.execute_async(command)
+        self.telemetry.record_ns("control_to_command", time.perf_counter_ns() - received_at)
+
+
+    def run(self, status_interval=None):
+        if self.control_server is not None:
+            self.control_server.start()
+            print("控制接口：", self.control_server.address)
+        self.pipeline.start()
+        try:
+            while not self.stopped.wait(status_interval):
+                if status_interval is not None:
+                    self.print_status()
+        finally:
+            self.close()
+
+
+    def print_status(self):
+        fps = self.telemetry.fps()
+        song = self.player.current_path()
+        state = "播放中" if self.player.get_busy() else "暂停"
+        fps_text = "-" if fps is None else f"{fps:.1f}"
+        print(f"\r[{state}] 音量 {self.player.volume} | FPS {fps_text} | {self.player.title_of(song) if song else '-'}",
+              end="", flush=True)
+
+
+    def close(self):
+        if self.control_server is not None:
+            self.control_server.stop()
+        self.pipeline.stop()
+        self.player.close()
+        self.source.release()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="无界面运行手势识别音乐播放器")
+    parser.add_argument("--music", default="music", help="音乐文件所在目录")
+    parser.add_argument("--camera", type=int, default=0, help="摄像头编号")
+    parser.add_argument("--hands", type=int, default=1, help="最多检测的手的数量，多人同时使用时大于 1")
+    parser.add_argument("--arbitration", choices=ARBITRATION_POLICIES, default="largest",
+                        help="多只手时选择控制手的策略：largest 为最大（最近）的手，first_hold 为最先保持手势的手")
+    parser.add_argument("--classifier", metavar="FILE", help="使用 tools/train_classifier.py 训练的手势分类器识别静态手势")
+    parser.add_argument("--status", action="store_true", help="每秒在终端中刷新播放状态")
+    parser.add_argument("--replay", metavar="DIR", help="回放录制目录中的画面或关键点，代替摄像头")
+    parser.add_argument("--max-speed", action="store_true", help="回放时不按录制速度等待")
+    parser.add_argument("--landmarks-only", action="store_true", help="回放时只使用录制的关键点，跳过推理")
+    parser.add_argument("--record", metavar="DIR", help="将摄像头画面与关键点录制到该目录")
+    parser.add_argument("--record-frames", type=int, default=9000, help="最多录制的帧数")
+    parser.add_argument("--no-record-images", action="store_true", help="只录制关键点，不保存画面")
+    parser.add_argument("--metrics", metavar="FILE", help="退出时将性能统计导出到该文件（.json 或 .csv）")
+    parser.add_argument("--control", nargs="?", const="", metavar="ADDR",
+                        help="启动本地控制接口，ADDR 为“主机:端口”（默认 127.0.0.1:8765）或“unix:/路径”")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    args = parse_args(sys.argv[1:])
+
+    if args.replay:
+        source = ReplaySource(args.replay, realtime=not args.max_speed, landmarks_only=args.landmarks_only)
+    else:
+        source = CameraSource(args.camera)
+    recorder = None
+    if args.record:
+        recorder = SessionRecorder(args.record, args.record_frames, save_frames=not args.no_record_images)
+
+    classifier = GestureClassifier.load(args.classifier) if args.classifier else None
+    app = HeadlessPlayer(source, args.music, recorder, hands=args.hands, arbitration=args.arbitration,
+                         classifier=classifier, control_address=args.control)
+    # Ctrl+C 和 SIGTERM 都正常退出，保存收藏与录制数据
+    signal.signal(signal.SIGINT, lambda signum, frame: app.stopped.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: app.stopped.set())
+    app.run(1.0 if args.status else None)
+    if args.metrics:
+        app.telemetry.dump(args.metrics)
@@ -1,15 +1,22 @@
 import sys
 import time
+
+# 程序开始运行的时间，启动各阶段（窗口显示、加载完成、第一帧、第一个手势）的耗时都相对于这一时刻统计
+STARTED_AT = time.perf_counter_ns()
+
+import logging
+import argparse
 import threading
-import cv2 as cv
-from collections import deque
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
+from PyQt5 import QtCore
 import qdarkstyle
 
+# mediapipe、OpenCV、pygame 等较重的依赖在后台线程中创建对应对象时才导入，不影响窗口显示
 from SubPanes import ListPane, MainPane, ControlPane
-from GestureRecognizer import Command, GestureRecognizer
-from MusicPlayer import MusicPlayer
+from Command import Command
+from Telemetry import Telemetry
+from HandTracker import ARBITRATION_POLICIES
 
 
 def readQssFile(file_path):
@@ -18,26 +25,196 @@ def readQssFile(file_path):
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    # 推理线程识别出的手势命令通过信号交给 GUI 线程执行，参数为命令和对应画面的采集时间（纳秒）
+    command_ready = QtCore.pyqtSignal(object, object)
+    # 渲染线程处理好的画面缓冲区通过信号交给 GUI 线程显示
+    frame_ready = QtCore.pyqtSignal(object)
+    # 本地控制接口收到的命令，与手势命令一样在 GUI 线程中执行，参数为命令和收到请求的时间（纳秒）
+    remote_command = QtCore.pyqtSignal(object, object)
+
+    # 后台加载完成后通过信号把创建好的对象交给 GUI 线程
+    player_ready = QtCore.pyqtSignal(object)
+    recognizer_ready = QtCore.pyqtSignal(object)
+    source_ready = QtCore.pyqtSignal(object)
+    load_failed = QtCore.pyqtSignal(str, object)
+
+    # source 为画面来源，也可以是在后台线程中创建画面来源的函数，为 None 时打开摄像头；
+    # hands 为最多检测的手的数量，arbitration 为多只手时选择控制手的策略（见 HandTracker）；
+    # classifier_path 为 tools/train_classifier.py 训练的手势分类器，不指定时使用规则识别；
+    # control_address 不为 None 时在播放器加载完成后启动本地控制接口（见 ControlServer）
+    def __init__(self, source=None, recorder=None, metrics_path=None, overlay=False, hands=1, arbitration="largest",
+                 classifier_path=None, control_address=None):
         super(MainWindow, self).__init__()
 
-        self.player = MusicPlayer('music')
-        self.recognizer = GestureRecognizer()
+        # 各模块共用的性能遥测，退出时导出到 metrics_path
+        self.telemetry = Telemetry()
+        self.metrics_path = metrics_path
+        self.overlay = overlay
+        self.recorder = recorder
+        self.hands = hands
+        self.arbitration = arbitration
+        self.classifier_path = classifier_path
+        self.control_address = control_address
 
+        # 播放器、手势识别器和画面来源都在后台线程中创建，创建完成之前为 None；
+        # 三者都准备好之后才启动流水线
+        self.player = None
+        self.recognizer = None
+        self.source = None
+        self.pipeline = None
+        self.control_server = None
+        self.listpane_layout = None
+        self.main_pane = None
+        self.controlpane_layout = None
         self.camera_width, self.camera_height = 640, 480
-        self.camera = cv.VideoCapture(0, cv.CAP_DSHOW)
-        self.camera.set(3, self.camera_width)
-        self.camera.set(4, self.camera_height)
+        self.loading = []  # 正在加载的模块名称，显示在状态栏中
+        self.closed = False
+        self.__milestones = set()
+
+        self.init_window()
+
+        self.command_ready.connect(self.dispatch_command)
+        self.remote_command.connect(self.dispatch_remote)
+        self.frame_ready.connect(self.display_frame)
+        self.frame_pending = False  # GUI 线程还没有显示完上一帧
+        self.player_ready.connect(self.on_player_ready)
+        self.recognizer_ready.connect(self.on_recognizer_ready)
+        self.source_ready.connect(self.on_source_ready)
+        self.load_failed.connect(self.on_load_failed)
+
+        # 默认使用摄像头画面，也可以传入 ReplaySource 回放录制数据
+        if source is None:
+            source = self.open_camera
+        if callable(source):
+            self.load_in_background("摄像头", source, self.source_ready)
+        else:
+            self.source = source
+        self.load_in_background("播放器", self.create_player, self.player_ready)
+        self.load_in_background("手势模型", self.create_recognizer, self.recognizer_ready)
+
+
+    # 在后台线程中执行 create，完成后通过 ready 信号把结果交给 GUI 线程
+    def load_in_background(self, name, create, ready):
+        self.loading.append(name)
+        self.update_loading_status()
+
+        def load():
+            try:
+                result = create()
+            except Exception as e:
+                print(e, type(e))
+                self.load_failed.emit(name, e)
+                return
+            ready.emit(result)
+
+        threading.Thread(target=load, daemon=True).start()
+
 
+    def open_camera(self):
+        from FrameSource import CameraSource
+        return CameraSource(0, self.camera_width, self.camera_height)
+
+
+    def create_player(self):
+        from MusicPlayer import MusicPlayer
+        # 曲库由 ListPane 在后台扫描并分批显示，播放器只需要初始化 pygame 和收藏夹
+        return MusicPlayer('music', telemetry=self.telemetry, scan=False)
+
+
+    def create_recognizer(self):
+        from GestureRecognizer import GestureRecognizer
+        classifier = None
+        if self.classifier_path:
+            from GestureClassifier import GestureClassifier
+            classifier = GestureClassifier.load(self.classifier_path)
+        return GestureRecognizer(max_num_hands=self.hands, arbitration=self.arbitration, classifier=classifier)
+
+
+    def on_player_ready(self, player):
+        if self.closed:
+            player.close()
+            return
+        self.player = player
         self.init_ui()
+        self.listpane_layout.scan(player.root_path)
+        self.start_control_server()
+        self.finish_loading("播放器", "startup_player")
 
-        thread = threading.Thread(target=self.show_camera_view)
-        thread.setDaemon(True)
-        thread.start()
 
+    def start_control_server(self):
+        if self.control_address is None:
+            return
+        from ControlServer import ControlServer
+        try:
+            self.control_server = ControlServer(self.player, self.remote_command.emit, self.telemetry,
+                                                self.control_address).start()
+        except OSError as e:
+            print(e, type(e))
+            self.statusBar().showMessage(f"控制接口启动失败：{e}")
+            return
+        print("控制接口：", self.control_server.address)
 
-    def init_ui(self):
-        # 主窗口基本设定
+
+    def on_recognizer_ready(self, recognizer):
+        self.recognizer = recognizer
+        if self.listpane_layout is not None:
+            self.listpane_layout.set_gesture_functions(recognizer.gesture_functions)
+        self.finish_loading("手势模型", "startup_recognizer")
+
+
+    def on_source_ready(self, source):
+        if self.closed:
+            source.release()
+            return
+        self.source = source
+        self.finish_loading("摄像头", "startup_camera")
+
+
+    def on_load_failed(self, name, error):
+        self.loading.remove(name)
+        self.statusBar().showMessage(f"{name}加载失败：{error}")
+
+
+    def finish_loading(self, name, milestone):
+        self.loading.remove(name)
+        self.mark_startup(milestone)
+        self.update_loading_status()
+        self.start_pipeline()
+
+
+    def update_loading_status(self):
+        if self.loading:
+            self.statusBar().showMessage("正在加载：" + "、".join(self.loading))
+        else:
+            self.statusBar().showMessage("就绪", 3000)
+
+
+    # 记录启动阶段完成的时刻（相对于 STARTED_AT），每个阶段只记录第一次
+    def mark_startup(self, milestone):
+        if milestone in self.__milestones:
+            return
+        self.__milestones.add(milestone)
+        self.telemetry.record_ns(milestone, time.perf_counter_ns() - STARTED_AT)
+
+
+    # 界面、手势识别器和画面来源都准备好之后启动流水线
+    def start_pipeline(self):
+        if self.pipeline is not None or self.closed or None in (self.player, self.recognizer, self.source):
+            return
+        from CameraPipeline import CameraPipeline
+        self.pipeline = CameraPipeline(self.source, self.recognizer, self.command_ready.emit, self.show_camera_view,
+                                       recorder=self.recorder, stats=self.telemetry)
+        self.pipeline.start()
+
+
+    # 窗口第一次显示后处理完已有事件（包括第一次绘制）时记录窗口显示时间
+    def showEvent(self, e: QShowEvent):
+        super(MainWindow, self).showEvent(e)
+        QtCore.QTimer.singleShot(0, lambda: self.mark_startup("startup_window"))
+
+
+    # 主窗口基本设定，各窗格在播放器加载完成后由 init_ui 创建
+    def init_window(self):
         self.setWindowTitle("My App")
         self.setFixedSize(1200, 1000)
         self.setWindowOpacity(0.9)
@@ -45,6 +222,12 @@ class MainWindow(QMainWindow):
         size = self.geometry()
         self.move(int((screen.width() - size.width()) / 2), int((screen.height() - size.height()) / 2))
 
+        loading_label = QLabel("正在加载...")
+        loading_label.setAlignment(QtCore.Qt.AlignCenter)
+        self.setCentralWidget(loading_label)
+
+
+    def init_ui(self):
         # 主窗口布局
         main_layout = QGridLayout()
         main_layout.setContentsMargins(0, 0, 0, 0)
@@ -55,8 +238,9 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(main_widget)
 
         # 添加各子窗格
-        self.listpane_layout = ListPane(self.player, self.recognizer)
-        self.main_pane = MainPane(self.player, self.recognizer)
+        gesture_functions = self.recognizer.gesture_functions if self.recognizer is not None else ()
+        self.listpane_layout = ListPane(self.player, gesture_functions)
+        self.main_pane = MainPane(self.player, self.telemetry, self.overlay)
         self.controlpane_layout = ControlPane(self.player)
         main_layout.addWidget(self.listpane_layout, 0, 0, 90, 20)
         main_layout.addWidget(self.main_pane, 0, 20, 90, 80)
@@ -70,6 +254,20 @@ class MainWindow(QMainWindow):
         self.listpane_layout.song_switch.connect(self.controlpane_layout.update_label)
 
 
+    def dispatch_command(self, command: Command, captured_at: int):
+        start = time.perf_counter_ns()
+        self.execute(command)
+        finished = time.perf_counter_ns()
+        self.mark_startup("startup_first_gesture")
+        self.telemetry.record_ns("dispatch", finished - start)
+        self.telemetry.record_ns("gesture_to_command", finished - captured_at)
+
+
+    def dispatch_remote(self, command: Command, received_at: int):
+        self.execute(command)
+        self.telemetry.record_ns("control_to_command", time.perf_counter_ns() - received_at)
+
+
     def execute(self, command: Command):
         match command:
             case Command.TOGGLE:
@@ -84,6 +282,9 @@ class MainWindow(QMainWindow):
                 self.controlpane_layout.volume_down()
             case Command.TOGGLE_FAVORITE:
                 self.controlpane_layout.mark_like()
+            case (Command.SEEK_FORWARD | Command.SEEK_BACKWARD | Command.SHUFFLE | Command.RESTART
+                  | Command.REPEAT | Command.PLAY_FAVORITES | Command.CLEAR_QUEUE):
+                self.player.execute_async(command)
             case Command.EXIT:
                 self.close()
             case Command.NONE:
@@ -93,61 +294,86 @@ class MainWindow(QMainWindow):
 
 
     # 重写窗口关闭逻辑，用于释放播放器资源
+    # 后台加载还没有完成的模块在加载完成后由 on_player_ready 等直接释放
     def closeEvent(self, e: QCloseEvent):
-        self.player.close()
-        self.camera.release()
+        self.closed = True
+        if self.control_server is not None:
+            self.control_server.stop()
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        if self.main_pane is not None:
+            self.main_pane.cover_loader.shutdown()
+        if self.listpane_layout is not None and self.listpane_layout.scanner is not None:
+            self.listpane_layout.scanner.cancel()
+            self.listpane_layout.scanner.join(1)
+        if self.player is not None:
+            self.player.close()
+        if self.source is not None:
+            self.source.release()
+        if self.metrics_path:
+            self.telemetry.dump(self.metrics_path)
 
 
-    def show_camera_view(self):
-        # 用于 FPS 统计
-        current_time = 0
-        previous_time = 0
+    # 流水线的渲染阶段，在渲染线程中调用：把画面缓冲区交给 GUI 线程，GUI 线程还没有显示完上一帧时丢弃本帧
+    def show_camera_view(self, frame):
+        if self.frame_pending:
+            return False
+        self.frame_pending = True
+        self.frame_ready.emit(frame)
+        return True
 
-        # 使用队列存储之前的手势中心位置
-        # 这样可以增大左挥手的时间间隔要求，使这个动作更容易做出，提升用户体验
-        previous_centers = deque(maxlen=4)
-        current_center = (0, 0)
-        previous_command = Command.NONE
 
-        while True:
-            ret, frame = self.camera.read()
-            frame = cv.flip(frame, 1)
-            if not ret:
-                break
+    # 直接用画面缓冲区构造 BGR888 格式的 QImage，不再转换为 BGRA；显示后归还缓冲区
+    def display_frame(self, frame):
+        image = QImage(frame.data, frame.shape[1], frame.shape[0], frame.strides[0], QImage.Format_BGR888)
+        self.main_pane.update_camera_image(image)
+        self.pipeline.release_frame(frame)
+        self.frame_pending = False
+        self.mark_startup("startup_first_frame")
 
-            try:
-                landmark = self.recognizer.get_landmark(frame)
-                previous_centers.append(current_center)
-                last_center = previous_centers.popleft()
-                current_center, command = self.recognizer.gesture_recognise(frame, landmark, last_center)
-                previous_centers.appendleft(last_center)
-                if command != previous_command or command in\
-                    [Command.VOLUME_DOWN, Command.VOLUME_UP]:
-                    self.execute(command)
-                    previous_command = command
-            except RuntimeError as e:
-                previous_centers.append(current_center)
-            except TypeError as e:
-                print(type(e), e)
-            except ValueError as e:
-                print(type(e), e)
-
-            current_time = time.time()
-            fps = 1 / (current_time - previous_time)
-            previous_time = current_time
-            cv.putText(frame, str(int(fps)), (20, 50), cv.FONT_HERSHEY_COMPLEX_SMALL, 2, (0x66, 0xcc, 0xff), thickness=2)
-
-            image_buffer = cv.cvtColor(frame, cv.COLOR_BGR2BGRA)
-            image = QImage(image_buffer.data, image_buffer.shape[1], image_buffer.shape[0], QImage.Format_RGB32)
-            self.main_pane.update_camera_image(image)
-            cv.waitKey(1)
+
+# 回放数据在后台线程中打开
+def open_replay(args):
+    from FrameSource import ReplaySource
+    return ReplaySource(args.replay, realtime=not args.max_speed, landmarks_only=args.landmarks_only)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="基于手势识别的音乐播放器")
+    parser.add_argument("--replay", metavar="DIR", help="回放录制目录中的画面或关键点，代替摄像头")
+    parser.add_argument("--max-speed", action="store_true", help="回放时不按录制速度等待")
+    parser.add_argument("--landmarks-only", action="store_true", help="回放时只使用录制的关键点，跳过推理")
+    parser.add_argument("--record", metavar="DIR", help="将摄像头画面与关键点录制到该目录")
+    parser.add_argument("--record-frames", type=int, default=9000, help="最多录制的帧数")
+    parser.add_argument("--no-record-images", action="store_true", help="只录制关键点，不保存画面")
+    parser.add_argument("--metrics", metavar="FILE", help="退出时将性能统计导出到该文件（.json 或 .csv）")
+    parser.add_argument("--hands", type=int, default=1, help="最多检测的手的数量，多人同时使用时大于 1")
+    parser.add_argument("--arbitration", choices=ARBITRATION_POLICIES, default="largest",
+                        help="多只手时选择控制手的策略：largest 为最大（最近）的手，first_hold 为最先保持手势的手")
+    parser.add_argument("--classifier", metavar="FILE", help="使用 tools/train_classifier.py 训练的手势分类器识别静态手势")
+    parser.add_argument("--overlay", action="store_true", help="在界面上显示帧率与各阶段耗时")
+    parser.add_argument("--control", nargs="?", const="", metavar="ADDR",
+                        help="启动本地控制接口，ADDR 为“主机:端口”（默认 127.0.0.1:8765）或“unix:/路径”")
+    # 其余参数留给 Qt 处理
+    return parser.parse_known_args(argv)
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    args, qt_args = parse_args(sys.argv[1:])
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setStyleSheet(qdarkstyle.load_stylesheet(qt_api="pyqt5"))
 
-    w = MainWindow()
+    source = None
+    if args.replay:
+        source = lambda: open_replay(args)
+    recorder = None
+    if args.record:
+        from FrameSource import SessionRecorder
+        recorder = SessionRecorder(args.record, args.record_frames, save_frames=not args.no_record_images)
+
+    w = MainWindow(source, recorder, args.metrics, args.overlay, args.hands, args.arbitration, args.classifier,
+                   args.control)
     w.show()
 
     app.exec_()
@@ -0,0 +1,70 @@
+# 命令过滤器离线评估：对录制的关键点序列重新识别手势，比较改造前的触发策略与 CommandFilter 的触发次数
+#
+# 录制目录由 main.py --record 或 tools/record_session.py 生成，格式见 FrameSource.py
+#
+# 用法：python tools/eval_filter.py <录制目录> [--expect NONE] [--window 5 --enter 3 --release 2]
+# 指定 --expect 时，除该命令以外的所有触发都计为误触发；录制空闲画面时使用 --expect NONE
+import os
+import sys
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from GestureRecognizer import Command, GestureRecognizer
+from CommandFilter import CommandFilter, LegacyCommandFilter, replay
+from FrameSource import ReplaySource
+
+
+def classify(recognizer, source):
+    commands = []
+    timestamps = []
+    while True:
+        ret, _ = source.read()
+        if not ret:
+            break
+        timestamps.append(source.timestamp)
+        landmark = source.landmark
+        # 与 CameraPipeline 的推理阶段一致：没有检测到手时清空手势中心的历史位置
+        if len(landmark) == 0:
+            recognizer.reset_tracking()
+            commands.append(Command.NONE)
+            continue
+        try:
+            commands.append(recognizer.gesture_recognise(None, landmark, source.timestamp))
+        except ValueError:
+            commands.append(Command.NONE)
+    return commands, timestamps
+
+
+def report(name, emitted, duration, expect):
+    counts = Counter(command.name for _, command in emitted)
+    line = f"{name:<8} triggers={len(emitted):<5} per_minute={len(emitted) / duration * 60:7.1f}"
+    if expect is not None:
+        false = sum(1 for _, command in emitted if command != expect)
+        line += f" false={false:<5} false_per_minute={false / duration * 60:7.1f}"
+    print(line, dict(counts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线评估命令过滤器的误触发率")
+    parser.add_argument("recording", help="录制目录")
+    parser.add_argument("--expect", choices=[command.name for command in Command], help="录制中期望触发的命令")
+    parser.add_argument("--window", type=int, default=5)
+    parser.add_argument("--enter", type=int, default=3)
+    parser.add_argument("--release", type=int, default=2)
+    args = parser.parse_args()
+
+    source = ReplaySource(args.recording, realtime=False, landmarks_only=True)
+    commands, timestamps = classify(GestureRecognizer(), source)
+    if not commands:
+        sys.exit(f"{args.recording} 中没有经过推理的帧")
+    duration = max(timestamps[-1] - timestamps[0], 1e-6)
+    expect = Command[args.expect] if args.expect else None
+
+    print(f"frames={len(commands)} duration={duration:.1f}s hands={int((source.valid == 1).sum())}")
+    report("legacy", replay(LegacyCommandFilter(), commands, timestamps), duration, expect)
+    report("filter", replay(CommandFilter(args.window, args.enter, args.release), commands, timestamps), duration, expect)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# 不启动界面，直接录制摄像头画面与关键点，供回放与基准测试使用
+#
+# 用法：python tools/record_session.py <录制目录> [--seconds 30] [--no-images]
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from GestureRecognizer import GestureRecognizer
+from CameraPipeline import CameraPipeline
+from FrameSource import CameraSource, SessionRecorder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="录制摄像头画面与关键点")
+    parser.add_argument("path", help="录制目录")
+    parser.add_argument("--seconds", type=float, default=30, help="录制时长")
+    parser.add_argument("--camera", type=int, default=0, help="摄像头编号")
+    parser.add_argument("--no-images", action="store_true", help="只录制关键点，不保存画面")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    source = CameraSource(args.camera)
+    # 按 60 FPS 预留空间，close 时会截断为实际帧数
+    recorder = SessionRecorder(args.path, int(args.seconds * 60) + 1, save_frames=not args.no_images)
+    pipeline = CameraPipeline(source, GestureRecognizer(), lambda command, captured_at: print(command.name),
+                              lambda frame: None, recorder=recorder)
+    pipeline.start()
+    try:
+        time.sleep(args.seconds)
+    except KeyboardInterrupt:
+        pass
+    pipeline.stop()
+    source.release()
+
+
+if __name__ == "__main__":
+    main()
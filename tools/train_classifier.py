@@ -0,0 +1,134 @@
+# 手势分类器的离线训练与评估：每个录制目录保持同一个手势，用“目录=命令”指定其标签，
+# 没有做任何手势的录制标为 NONE。每个录制按时间顺序切分，后 --val 比例的帧用于验证，
+# 输出验证集上的准确率、各命令的精确率/召回率、混淆矩阵、逐帧推理耗时，以及规则识别在同一数据上的准确率
+#
+# 录制目录由 main.py --record 或 tools/record_session.py 生成，格式见 FrameSource.py
+#
+# 用法：python tools/train_classifier.py <模型文件.npz> <录制目录>=<命令> [...] [--val 0.2] [--augment 4]
+#       python tools/train_classifier.py <模型文件.npz> <录制目录>=<命令> [...] --eval-only
+#   训练好的模型可以通过 main.py / headless.py 的 --classifier 参数使用
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Command import Command
+from GestureClassifier import GestureClassifier
+from FrameSource import ReplaySource
+
+
+def parse_dataset(value):
+    path, _, name = value.rpartition("=")
+    if not path or name not in Command.__members__:
+        raise argparse.ArgumentTypeError(f"需要“录制目录=命令”的格式，命令为 {', '.join(Command.__members__)} 之一")
+    return path, Command[name]
+
+
+# 读取各录制中检测到手的帧，按时间顺序切分为训练集和验证集
+def load(datasets, val):
+    train, validation = ([], []), ([], [])
+    for path, command in datasets:
+        source = ReplaySource(path, realtime=False, landmarks_only=True)
+        landmarks = np.asarray(source.landmarks)[source.valid == 1]
+        split = len(landmarks) - int(len(landmarks) * val)
+        for (features, labels), part in ((train, landmarks[:split]), (validation, landmarks[split:])):
+            features.append(part)
+            labels.extend([command] * len(part))
+        print(f"{path}: {command.name} {len(landmarks)} 帧")
+    return tuple((np.concatenate(features) if features else np.empty((0, 21, 2)), labels)
+                 for features, labels in (train, validation))
+
+
+# 在关键点上叠加相对于手掌大小的随机抖动，模拟关键点检测的误差
+def augment(landmarks, labels, copies, noise, seed=0):
+    if copies <= 0:
+        return landmarks, labels
+    rng = np.random.default_rng(seed)
+    palm = np.linalg.norm(landmarks[:, 9] - landmarks[:, 0], axis=1)[:, None, None]
+    jittered = [landmarks + rng.normal(0, noise, landmarks.shape) * palm for _ in range(copies)]
+    return np.concatenate([landmarks] + jittered), labels * (copies + 1)
+
+
+def report(name, predictions, labels):
+    commands = sorted(set(labels) | set(predictions), key=lambda command: command.value)
+    correct = sum(prediction == label for prediction, label in zip(predictions, labels))
+    print(f"{name}: 准确率 {correct / len(labels):.3f}（{correct}/{len(labels)}）")
+    for command in commands:
+        true_positive = sum(p == command and l == command for p, l in zip(predictions, labels))
+        predicted = sum(p == command for p in predictions)
+        actual = sum(l == command for l in labels)
+        precision = true_positive / predicted if predicted else 0.0
+        recall = true_positive / actual if actual else 0.0
+        print(f"  {command.name:<16} 精确率 {precision:.3f}  召回率 {recall:.3f}  (n={actual})")
+
+
+def confusion(predictions, labels):
+    commands = sorted(set(labels) | set(predictions), key=lambda command: command.value)
+    index = {command: i for i, command in enumerate(commands)}
+    matrix = np.zeros((len(commands), len(commands)), dtype=int)
+    for prediction, label in zip(predictions, labels):
+        matrix[index[label], index[prediction]] += 1
+    print("混淆矩阵（行为标签，列为识别结果）：")
+    print(" " * 17 + "".join(f"{command.name[:8]:>9}" for command in commands))
+    for command, row in zip(commands, matrix):
+        print(f"  {command.name:<15}" + "".join(f"{count:>9}" for count in row))
+
+
+# 逐帧调用 predict，与运行时的使用方式一致
+def measure_latency(classifier, landmarks, repeat=3):
+    latencies = []
+    for _ in range(repeat):
+        for landmark in landmarks:
+            start = time.perf_counter_ns()
+            classifier.predict(landmark)
+            latencies.append(time.perf_counter_ns() - start)
+    latencies = np.array(latencies) / 1000
+    print(f"逐帧推理耗时：p50 {np.percentile(latencies, 50):.1f} us  p99 {np.percentile(latencies, 99):.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="训练并评估基于关键点特征的手势分类器")
+    parser.add_argument("model", help="模型文件（.npz），训练时写入，--eval-only 时读取")
+    parser.add_argument("datasets", nargs="+", type=parse_dataset, metavar="录制目录=命令")
+    parser.add_argument("--val", type=float, default=0.2, help="每个录制末尾用于验证的帧的比例")
+    parser.add_argument("--eval-only", action="store_true", help="不训练，用全部数据评估已有的模型")
+    parser.add_argument("--hidden", type=int, default=64, help="隐层大小")
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--augment", type=int, default=4, help="每帧额外生成的抖动样本数")
+    parser.add_argument("--noise", type=float, default=0.03, help="抖动的标准差（相对于手掌长度）")
+    parser.add_argument("--min-confidence", type=float, default=0.6, help="低于该概率时识别为 NONE")
+    parser.add_argument("--no-rules", action="store_true", help="不与规则识别对比（对比需要加载 mediapipe）")
+    args = parser.parse_args()
+
+    (train_landmarks, train_labels), (val_landmarks, val_labels) = load(args.datasets, 1.0 if args.eval_only else args.val)
+    if args.eval_only:
+        classifier = GestureClassifier.load(args.model)
+    else:
+        if not train_labels:
+            sys.exit("没有可用于训练的帧")
+        landmarks, labels = augment(train_landmarks, train_labels, args.augment, args.noise)
+        start = time.perf_counter()
+        classifier = GestureClassifier.train(landmarks, labels, hidden=args.hidden, epochs=args.epochs,
+                                             min_confidence=args.min_confidence)
+        print(f"训练 {len(labels)} 个样本，用时 {time.perf_counter() - start:.1f}s")
+        classifier.save(args.model)
+        print(f"模型已保存到 {args.model}")
+        report("训练集", classifier.predict_batch(train_landmarks), train_labels)
+
+    if not val_labels:
+        return
+    predictions = classifier.predict_batch(val_landmarks)
+    report("验证集", predictions, val_labels)
+    confusion(predictions, val_labels)
+    measure_latency(classifier, val_landmarks)
+
+    if not args.no_rules:
+        from GestureRecognizer import GestureRecognizer
+        recognizer = GestureRecognizer()
+        report("规则识别", [recognizer.rule_based_gesture(landmark) for landmark in val_landmarks], val_labels)
+
+
+if __name__ == "__main__":
+    main()